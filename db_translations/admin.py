@@ -1,35 +1,117 @@
-from django.contrib import admin
-from django.utils.html import format_html
+from django.contrib import admin, messages
+from django.db.models import Count
+from django.utils.html import format_html, format_html_join
 from django.utils.translation import gettext_lazy as _
-from .models import Language, Translation
+from .models import CatalogSnapshot, Language, Translation
+from .paginator import EstimatedCountPaginator
+from .snapshots import publish_catalog, rollback_catalog
+from .translation_memory import translation_memory
+
+
+class TranslationStatusFilter(admin.SimpleListFilter):
+    """
+    Filter on whether a string has been translated. The untranslated case is
+    served by a partial index, so it stays cheap on very large catalogs.
+    """
+    title = _('status')
+    parameter_name = 'status'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('untranslated', _('Untranslated')),
+            ('translated', _('Translated')),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == 'untranslated':
+            return queryset.filter(translation='')
+        if self.value() == 'translated':
+            return queryset.exclude(translation='')
+        return queryset
 
 
 @admin.register(Language)
 class LanguageAdmin(admin.ModelAdmin):
-    list_display = ('code', 'name', 'is_active', 'translation_count')
+    list_display = ('code', 'name', 'is_active', 'translation_count', 'published_version')
     list_filter = ('is_active',)
+    list_select_related = ('published_snapshot',)
     search_fields = ('code', 'name')
+    readonly_fields = ('published_snapshot',)
+    actions = ('publish_catalogs', 'rollback_catalogs')
+
+    def get_queryset(self, request):
+        # Count translations in the changelist query instead of once per row
+        return super().get_queryset(request).annotate(translation_total=Count('translations'))
     
     def translation_count(self, obj):
-        return obj.translations.count()
+        return obj.translation_total
     translation_count.short_description = _('Translations')
+    translation_count.admin_order_field = 'translation_total'
+
+    def published_version(self, obj):
+        return obj.published_snapshot.version if obj.published_snapshot else None
+    published_version.short_description = _('Published version')
+
+    def publish_catalogs(self, request, queryset):
+        for language in queryset:
+            snapshot = publish_catalog(language.code, note=f"Published by {request.user}")
+            self.message_user(request, _('Published %(code)s version %(version)s') % {
+                'code': language.code, 'version': snapshot.version,
+            })
+    publish_catalogs.short_description = _('Publish catalog snapshot')
+
+    def rollback_catalogs(self, request, queryset):
+        for language in queryset:
+            try:
+                snapshot = rollback_catalog(language.code)
+            except ValueError as e:
+                self.message_user(request, str(e), messages.WARNING)
+            else:
+                self.message_user(request, _('Rolled back %(code)s to version %(version)s') % {
+                    'code': language.code, 'version': snapshot.version,
+                })
+    rollback_catalogs.short_description = _('Roll back to previous snapshot')
 
 
 @admin.register(Translation)
 class TranslationAdmin(admin.ModelAdmin):
-    list_display = ('truncated_message_id', 'language', 'truncated_translation', 'context', 'location', 'updated_at')
-    list_filter = ('language', 'context')
-    search_fields = ('message_id', 'translation', 'context', 'location')
-    readonly_fields = ('created_at', 'updated_at')
+    list_display = ('truncated_message_id', 'language', 'truncated_translation', 'context', 'namespace', 'tenant', 'location', 'updated_at')
+    list_filter = ('language', TranslationStatusFilter, 'fuzzy')
+    list_select_related = ('language',)
+    # On PostgreSQL these lookups are served by the trigram indexes created
+    # after migrate (see signals.create_search_indexes); other backends scan.
+    # Any further field ORed into the search would make every search scan.
+    search_fields = ('message_id', 'translation')
+    # Searched on their own with a "field:value" term, e.g. "tenant:brand-a"
+    exact_search_fields = ('context', 'location', 'namespace', 'tenant')
+    search_help_text = _(
+        'Searches message IDs and translations. Use context:, location:, '
+        'namespace: or tenant: followed by a value to match that field exactly.'
+    )
+    # By the column rather than the language code, so the (language, message_id)
+    # index serves unfiltered pages without sorting the whole table
+    ordering = ('language_id', 'message_id')
+    readonly_fields = ('created_at', 'updated_at', 'suggestions')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     fieldsets = (
         (None, {
-            'fields': ('language', 'message_id', 'translation')
+            'fields': ('language', 'message_id', 'translation', 'fuzzy', 'namespace', 'tenant')
+        }),
+        (_('Translation Memory'), {
+            'fields': ('suggestions',)
         }),
         (_('Additional Information'), {
             'fields': ('context', 'location', 'created_at', 'updated_at')
         }),
     )
     
+    def get_search_results(self, request, queryset, search_term):
+        field, separator, value = search_term.partition(':')
+        if separator and field.strip() in self.exact_search_fields:
+            return queryset.filter(**{field.strip(): value.strip()}), False
+        return super().get_search_results(request, queryset, search_term)
+
     def truncated_message_id(self, obj):
         return (obj.message_id[:50] + '...') if len(obj.message_id) > 50 else obj.message_id
     truncated_message_id.short_description = _('Message ID')
@@ -39,3 +121,35 @@ class TranslationAdmin(admin.ModelAdmin):
             return format_html('<span style="color: #FF0000;">Not translated</span>')
         return (obj.translation[:50] + '...') if len(obj.translation) > 50 else obj.translation
     truncated_translation.short_description = _('Translation')
+
+    def suggestions(self, obj):
+        if not obj.pk:
+            return '-'
+        # Never build a memory inside the request, it can take a while
+        memory = translation_memory.get_ready(obj.language.code)
+        if memory is None:
+            return _('The translation memory is being built, reload the page in a moment')
+        matches = memory.suggest(obj.message_id, exclude_pk=obj.pk)
+        if not matches:
+            return _('No similar translations found')
+        return format_html(
+            '<table>{}</table>',
+            format_html_join(
+                '', '<tr><td>{}</td><td>{}</td><td>{}</td></tr>',
+                ((f"{match.score:.0%}", match.message_id, match.translation) for match in matches)
+            )
+        )
+    suggestions.short_description = _('Similar translations')
+
+
+@admin.register(CatalogSnapshot)
+class CatalogSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('language', 'version', 'message_count', 'note', 'created_at')
+    list_filter = ('language',)
+    list_select_related = ('language',)
+    exclude = ('data', 'keys')
+    readonly_fields = ('language', 'version', 'message_count', 'note', 'created_at')
+
+    def has_add_permission(self, request):
+        # Snapshots are created by publishing a catalog
+        return False
@@ -0,0 +1,102 @@
+"""
+Batch lookups for code that translates many strings at once, such as
+serializers and exports.
+
+The language, tenant and namespaces are resolved once, after which every
+message is a direct lookup in the catalogs instead of a trip through
+gettext, the active translation object and its closures.
+"""
+from django.conf import settings
+from django.utils.safestring import SafeData, mark_safe
+from django.utils.translation import get_language
+from .translation import db_translation
+
+CONTEXT_SEPARATOR = '\x04'
+
+
+class Translator:
+    """
+    Translations of one language, bound to the tenant and namespaces that
+    are current when it's created. Get one per request or task and reuse
+    it; it keeps serving the catalogs that were loaded at that time.
+
+    Messages are message ids, as passed to gettext; lazy strings are
+    already translated into the active language when converted.
+    """
+    def __init__(self, language=None):
+        self.language = language or get_language() or settings.LANGUAGE_CODE
+        catalogs, self._fallback = db_translation.get_catalogs(self.language)
+
+        if len(catalogs) == 1:
+            # Only the base catalog, no tenant overrides or namespaces
+            self._get = catalogs[0].get
+        else:
+            def get(key):
+                for catalog in catalogs:
+                    result = catalog.get(key)
+                    if result:
+                        return result
+                return None
+            self._get = get
+
+    def _translate(self, key):
+        if '\r' in key:
+            # gettext normalises line endings before looking messages up
+            key = key.replace('\r\n', '\n').replace('\r', '\n')
+        if not key:
+            return ''
+        return self._get(key) or self._fallback(key)
+
+    def gettext(self, message):
+        result = self._translate(message)
+        return mark_safe(result) if isinstance(message, SafeData) else result
+
+    __call__ = gettext
+
+    def pgettext(self, context, message):
+        result = self._translate(f"{context}{CONTEXT_SEPARATOR}{message}")
+        if CONTEXT_SEPARATOR in result:
+            # Translation not found
+            return message
+        return mark_safe(result) if isinstance(message, SafeData) else result
+
+    def gettext_many(self, messages):
+        """Translate a sequence of messages, returning a list in the same order"""
+        get = self._get
+        results = []
+        for message in messages:
+            result = get(message) if message and '\r' not in message else None
+            if not result:
+                # Misses and unusual messages take the complete path
+                result = self._translate(message)
+            results.append(mark_safe(result) if isinstance(message, SafeData) else result)
+        return results
+
+    def pgettext_many(self, context, messages):
+        """Translate a sequence of messages sharing a context, returning a list in the same order"""
+        get = self._get
+        prefix = f"{context}{CONTEXT_SEPARATOR}"
+        results = []
+        for message in messages:
+            result = get(prefix + message)
+            if not result:
+                result = self.pgettext(context, message)
+            elif isinstance(message, SafeData):
+                result = mark_safe(result)
+            results.append(result)
+        return results
+
+
+def get_translator(language=None):
+    """Get a Translator for a language, or for the active language"""
+    return Translator(language)
+
+
+def gettext_many(messages, language=None):
+    """Translate a sequence of messages into a language, or into the active language"""
+    return Translator(language).gettext_many(messages)
+
+
+def pgettext_many(context, messages, language=None):
+    """Translate a sequence of messages sharing a context into a language, or into the active language"""
+    return Translator(language).pgettext_many(context, messages)
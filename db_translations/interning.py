@@ -0,0 +1,122 @@
+import hashlib
+import threading
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+_missing = object()
+
+
+class KeyTable:
+    """
+    Process-wide table that stores every catalog key (message id, or context
+    and message id) once and assigns it a compact integer id.
+    """
+    def __init__(self):
+        self._ids = {}
+        self._keys = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def get_id(self, key):
+        """Get the id of a key, or None if no catalog uses it"""
+        return self._ids.get(key)
+
+    def intern(self, key):
+        """Get the id of a key, adding it to the table if needed"""
+        key_id = self._ids.get(key)
+        if key_id is None:
+            with self._lock:
+                key_id = self._ids.get(key)
+                if key_id is None:
+                    key_id = len(self._keys)
+                    self._keys.append(key)
+                    self._ids[key] = key_id
+        return key_id
+
+    def key(self, key_id):
+        """Get the key stored under an id"""
+        return self._keys[key_id]
+
+
+# Create a singleton instance
+key_table = KeyTable()
+
+
+class InternedCatalog(Mapping):
+    """
+    Read-only translations mapping that holds no keys of its own. It stores
+    the sorted ids its keys have in the shared key table, in a compact
+    array, and the values aligned with them, so the keys of all languages
+    are stored once per process and a catalog costs the same whatever ids
+    its keys got.
+    """
+    __slots__ = ('_ids', '_values', '_table')
+
+    def __init__(self, translations=(), table=key_table):
+        if isinstance(translations, Mapping):
+            translations = translations.items()
+        self._table = table
+        self._set_entries((table.intern(key), key, value) for key, value in translations)
+
+    @classmethod
+    def from_key_ids(cls, key_ids, values, table=key_table):
+        """Build a catalog from values aligned with a list of key ids"""
+        catalog = cls(table=table)
+        catalog._set_entries((key_id, table.key(key_id), value) for key_id, value in zip(key_ids, values))
+        return catalog
+
+    def _set_entries(self, entries):
+        # Keyed by id, so a repeated key keeps its last value
+        values = {}
+        for key_id, key, value in entries:
+            # Source-language catalogs mostly map keys to themselves; share the string
+            values[key_id] = key if value == key else value
+        ids = sorted(values)
+        self._ids = array('q', ids)
+        self._values = [values[key_id] for key_id in ids]
+
+    def get(self, key, default=None):
+        key_id = self._table.get_id(key)
+        if key_id is None:
+            return default
+        index = bisect_left(self._ids, key_id)
+        if index < len(self._ids) and self._ids[index] == key_id:
+            return self._values[index]
+        return default
+
+    def __getitem__(self, key):
+        value = self.get(key, _missing)
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _missing) is not _missing
+
+    def __iter__(self):
+        for key_id in self._ids:
+            yield self._table.key(key_id)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __reduce__(self):
+        # Pickle as a plain dict, key ids are only meaningful in this process
+        return (InternedCatalog, (dict(self.items()),))
+
+
+def pack_catalog(translations):
+    """
+    Split a translations mapping into a digest of its sorted keys, the keys
+    themselves and the values in key order.
+
+    Languages extracted from the same sources share their key list and thus
+    its digest, so a cached key list is decoded once per process and every
+    language's cache blob only carries its values.
+    """
+    keys = sorted(translations)
+    digest = hashlib.sha1('\x00'.join(keys).encode('utf-8')).hexdigest()
+    return digest, keys, [translations[key] for key in keys]
@@ -0,0 +1,75 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from db_translations.interning import InternedCatalog, KeyTable
+from db_translations.models import Language
+from db_translations.translation import db_translation
+
+
+def dict_size(translations):
+    """Approximate resident size of a plain catalog dict, keys and values included"""
+    return sys.getsizeof(translations) + sum(
+        sys.getsizeof(key) + sys.getsizeof(value) for key, value in translations.items()
+    )
+
+
+def interned_size(catalog):
+    """Approximate resident size of an InternedCatalog, without the shared keys"""
+    size = sys.getsizeof(catalog._ids) + sys.getsizeof(catalog._values)
+    for key_id, value in zip(catalog._ids, catalog._values):
+        if value is not catalog._table.key(key_id):
+            size += sys.getsizeof(value)
+    return size
+
+
+def table_size(table):
+    """Approximate resident size of a key table, keys included"""
+    return sys.getsizeof(table._ids) + sys.getsizeof(table._keys) + sum(sys.getsizeof(key) for key in table._keys)
+
+
+def format_size(size):
+    return f"{size / 1024 / 1024:.1f} MiB"
+
+
+class Command(BaseCommand):
+    help = "Reports the per-worker memory used by catalogs, with and without shared key storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--locale', '-l', dest='locale',
+            action='append', default=[],
+            help='Language code(s) to include (defaults to all active languages).'
+        )
+
+    def handle(self, *args, **options):
+        lang_codes = options['locale'] or list(
+            Language.objects.filter(is_active=True).values_list('code', flat=True)
+        )
+        if not lang_codes:
+            raise CommandError('No active languages found.')
+
+        # Measure against a private key table, so the report matches a fresh worker
+        table = KeyTable()
+        plain_total = 0
+        interned_total = 0
+
+        self.stdout.write(f"{'Language':<12}{'Strings':>10}{'Plain':>14}{'Shared keys':>14}")
+        for lang_code in lang_codes:
+            translations = db_translation.fetch_translations_from_db(lang_code)
+            plain = dict_size(translations)
+            interned = interned_size(InternedCatalog(translations, table=table))
+            plain_total += plain
+            interned_total += interned
+            self.stdout.write(
+                f"{lang_code:<12}{len(translations):>10}{format_size(plain):>14}{format_size(interned):>14}"
+            )
+
+        shared = table_size(table)
+        interned_total += shared
+        self.stdout.write(f"{'Key table':<12}{len(table):>10}{'':>14}{format_size(shared):>14}")
+
+        saved = plain_total - interned_total
+        percentage = saved / plain_total * 100 if plain_total else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Total per worker: {format_size(plain_total)} plain, {format_size(interned_total)} "
+            f"with DB_TRANSLATIONS_SHARED_KEYS ({format_size(saved)} or {percentage:.0f}% saved)"
+        ))
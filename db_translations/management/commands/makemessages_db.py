@@ -6,6 +6,7 @@ from django.core.management.commands.makemessages import Command as MakeMessages
 from django.conf import settings
 from django.utils.translation import to_locale
 import polib
+from db_translations.pruning import new_extraction_run_id
 from db_translations.utils import extract_messages_from_po_file
 from db_translations.models import Language
 
@@ -27,6 +28,11 @@ class Command(BaseCommand):
             '--domain', '-d', dest='domain',
             default='django', help='The domain of the message files.'
         )
+        parser.add_argument(
+            '--namespace', '-n', dest='namespace', default=None,
+            help='Catalog namespace to store the strings under (defaults to the default '
+                 'namespace for the django domain, and to the domain name otherwise).'
+        )
         parser.add_argument(
             '--ignore', '-i', action='append', dest='ignore_patterns',
             default=[], help='Ignore files or directories matching specified pattern.'
@@ -82,6 +88,7 @@ class Command(BaseCommand):
             
             # Use Django's makemessages to extract strings to PO files
             options_for_django = options.copy()
+            options_for_django.pop('namespace')
             options_for_django['verbosity'] = min(options['verbosity'], 1)  # Reduce verbosity
             django_command.handle(*args, **options_for_django)
             
@@ -89,6 +96,12 @@ class Command(BaseCommand):
             total_created = 0
             total_updated = 0
             
+            # Rows not stamped with this id are left for prune_translations
+            run_id = new_extraction_run_id()
+            namespace = options['namespace']
+            if namespace is None:
+                namespace = '' if options['domain'] == 'django' else options['domain']
+
             # Process each locale
             for locale in options['locale']:
                 # Convert locale to language code if needed
@@ -98,7 +111,7 @@ class Command(BaseCommand):
                 po_path = os.path.join(temp_locale_dir, locale, 'LC_MESSAGES', f"{domain}.po")
                 
                 if os.path.exists(po_path):
-                    created, updated = extract_messages_from_po_file(po_path, language_code)
+                    created, updated = extract_messages_from_po_file(po_path, language_code, namespace, run_id)
                     total_created += created
                     total_updated += updated
                     
@@ -114,7 +127,7 @@ class Command(BaseCommand):
             
             self.stdout.write(
                 self.style.SUCCESS(
-                    f"Translation extraction complete. Total: {total_created} new, {total_updated} updated"
+                    f"Translation extraction complete. Total: {total_created} new, {total_updated} updated (run {run_id})"
                 )
             )
                 
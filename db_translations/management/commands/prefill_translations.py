@@ -0,0 +1,104 @@
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from db_translations.models import Language
+from db_translations.prefill import init_worker, match_batch, match_rows
+from db_translations.translation import db_translation
+from db_translations.translation_memory import translation_memory
+from db_translations.utils import imap_bounded, iter_untranslated_chunks, save_translations
+
+
+class Command(BaseCommand):
+    help = "Pre-fills untranslated strings with fuzzy matches from the translation memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--locale', '-l', dest='locale',
+            action='append', default=[],
+            help='Language code(s) to pre-fill.'
+        )
+        parser.add_argument(
+            '--all', '-a', action='store_true', dest='all',
+            default=False, help='Pre-fills all active languages.'
+        )
+        parser.add_argument(
+            '--min-score', dest='min_score', type=float, default=0.8,
+            help='Minimum similarity (0-1) of a suggestion to be used.'
+        )
+        parser.add_argument(
+            '--batch-size', dest='batch_size', type=int, default=500,
+            help='Number of strings matched and written per batch.'
+        )
+        parser.add_argument(
+            '--workers', dest='workers', type=int, default=4,
+            help='Number of worker processes batches are matched in; 1 matches in this process.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true', dest='dry_run',
+            default=False, help='Reports matches without saving them.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1.')
+
+        if options['all']:
+            options['locale'] = list(Language.objects.filter(is_active=True).values_list('code', flat=True))
+
+        if not options['locale']:
+            raise CommandError('No locales specified. Use --locale or --all.')
+
+        for lang_code in options['locale']:
+            try:
+                language = Language.objects.get(code=lang_code)
+            except Language.DoesNotExist:
+                raise CommandError(f"Language '{lang_code}' does not exist")
+
+            matched = self.prefill_language(language, options)
+            verb = 'Would pre-fill' if options['dry_run'] else 'Pre-filled'
+            self.stdout.write(self.style.SUCCESS(f"{verb} {matched} strings for '{lang_code}'"))
+
+    def prefill_language(self, language, options):
+        memory = translation_memory.get(language.code)
+        chunks = iter_untranslated_chunks(language, options['batch_size'])
+
+        if options['workers'] == 1:
+            batches = (match_rows(memory, rows, options['min_score']) for rows in chunks)
+            matched = self.save_batches(batches, options)
+        else:
+            # Matching is CPU bound, so threads wouldn't run in parallel.
+            # Workers are spawned rather than forked, so they never share this
+            # process's database connections; each indexes its own copy of
+            # the memory once. At most `workers * 2` batches are held in
+            # memory while this process keeps reading and writing.
+            with ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+                initargs=(memory.entries(),),
+            ) as executor:
+                batches = imap_bounded(
+                    executor,
+                    functools.partial(match_batch, min_score=options['min_score']),
+                    chunks,
+                    options['workers'] * 2,
+                )
+                matched = self.save_batches(batches, options)
+
+        if matched and not options['dry_run']:
+            # One invalidation for the whole language instead of one per row
+            db_translation.invalidate_catalog(language.code)
+            translation_memory.touch(language.code)
+
+        return matched
+
+    def save_batches(self, batches, options):
+        matched = 0
+        for results in batches:
+            matched += len(results)
+            if results and not options['dry_run']:
+                save_translations(results, batch_size=options['batch_size'])
+        return matched
@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand, CommandError
+from db_translations.models import Language
+from db_translations.pretranslation import get_provider, pretranslate_language
+
+
+class Command(BaseCommand):
+    help = "Fills untranslated strings with machine translations from a provider"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--locale', '-l', dest='locale',
+            action='append', default=[],
+            help='Language code(s) to translate.'
+        )
+        parser.add_argument(
+            '--all', '-a', action='store_true', dest='all',
+            default=False, help='Translates all active languages.'
+        )
+        parser.add_argument(
+            '--provider', dest='provider', default=None,
+            help='Dotted path of the provider class (defaults to DB_TRANSLATIONS_PRETRANSLATE_PROVIDER).'
+        )
+        parser.add_argument(
+            '--source', dest='source', default=None,
+            help='Language the message ids are written in (defaults to LANGUAGE_CODE).'
+        )
+        parser.add_argument(
+            '--batch-size', dest='batch_size', type=int, default=None,
+            help="Number of strings sent per provider request (defaults to the provider's batch size)."
+        )
+        parser.add_argument(
+            '--workers', dest='workers', type=int, default=4,
+            help='Number of provider requests made in parallel.'
+        )
+        parser.add_argument(
+            '--rate-limit', dest='rate_limit', type=float, default=None,
+            help='Maximum number of provider requests per second.'
+        )
+        parser.add_argument(
+            '--retries', dest='retries', type=int, default=3,
+            help='Number of times a failed provider request is retried.'
+        )
+        parser.add_argument(
+            '--no-fuzzy', action='store_false', dest='fuzzy',
+            default=True, help='Serves the machine translations right away instead of marking them fuzzy.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true', dest='dry_run',
+            default=False, help='Translates without saving the results.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1.')
+        if options['retries'] < 0:
+            raise CommandError('--retries must be at least 0.')
+        if options['rate_limit'] is not None and options['rate_limit'] <= 0:
+            raise CommandError('--rate-limit must be greater than 0.')
+
+        if options['all']:
+            options['locale'] = list(Language.objects.filter(is_active=True).values_list('code', flat=True))
+
+        if not options['locale']:
+            raise CommandError('No locales specified. Use --locale or --all.')
+
+        try:
+            provider = get_provider(options['provider'])
+        except ImportError as e:
+            raise CommandError(f"Could not load the provider: {e}")
+
+        for lang_code in options['locale']:
+            try:
+                language = Language.objects.get(code=lang_code)
+            except Language.DoesNotExist:
+                raise CommandError(f"Language '{lang_code}' does not exist")
+
+            translated, failed = pretranslate_language(
+                language,
+                provider,
+                source_language=options['source'],
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                rate_limit=options['rate_limit'],
+                retries=options['retries'],
+                fuzzy=options['fuzzy'],
+                dry_run=options['dry_run'],
+            )
+            verb = 'Would translate' if options['dry_run'] else 'Translated'
+            self.stdout.write(self.style.SUCCESS(f"{verb} {translated} strings for '{lang_code}'"))
+            if failed:
+                self.stdout.write(self.style.WARNING(f"{failed} batches for '{lang_code}' failed after retries"))
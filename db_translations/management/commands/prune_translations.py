@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from db_translations.models import Language
+from db_translations.pruning import prune_language
+
+
+class Command(BaseCommand):
+    help = "Deletes translations of strings the latest makemessages_db run no longer found in the code"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--locale', '-l', dest='locale',
+            action='append', default=[],
+            help='Language code(s) to prune.'
+        )
+        parser.add_argument(
+            '--all', '-a', action='store_true', dest='all',
+            default=False, help='Prunes all languages.'
+        )
+        parser.add_argument(
+            '--archive', dest='archive', default=None,
+            help='File the pruned rows are appended to as JSON lines before deletion.'
+        )
+        parser.add_argument(
+            '--batch-size', dest='batch_size', type=int, default=1000,
+            help='Number of rows deleted per statement.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true', dest='dry_run',
+            default=False, help='Reports (and archives) unseen rows without deleting them.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        if options['all']:
+            options['locale'] = list(Language.objects.values_list('code', flat=True))
+
+        if not options['locale']:
+            raise CommandError('No locales specified. Use --locale or --all.')
+
+        archive = open(options['archive'], 'a', encoding='utf-8') if options['archive'] else None
+        try:
+            for lang_code in options['locale']:
+                try:
+                    language = Language.objects.get(code=lang_code)
+                except Language.DoesNotExist:
+                    raise CommandError(f"Language '{lang_code}' does not exist")
+
+                pruned = prune_language(
+                    language, chunk_size=options['batch_size'], archive=archive, dry_run=options['dry_run']
+                )
+                verb = 'Would prune' if options['dry_run'] else 'Pruned'
+                self.stdout.write(self.style.SUCCESS(f"{verb} {pruned} strings for '{lang_code}'"))
+        finally:
+            if archive is not None:
+                archive.close()
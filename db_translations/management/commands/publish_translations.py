@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from db_translations.models import Language
+from db_translations.snapshots import publish_catalog, rollback_catalog
+
+
+class Command(BaseCommand):
+    help = "Publishes the current database translations as versioned catalog snapshots"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--locale', '-l', dest='locale',
+            action='append', default=[],
+            help='Language code(s) to publish.'
+        )
+        parser.add_argument(
+            '--all', '-a', action='store_true', dest='all',
+            default=False, help='Publishes all active languages.'
+        )
+        parser.add_argument(
+            '--note', dest='note', default='',
+            help='Note stored with the published snapshot.'
+        )
+        parser.add_argument(
+            '--rollback', action='store_true', dest='rollback',
+            default=False, help='Restores an earlier snapshot instead of publishing.'
+        )
+        parser.add_argument(
+            '--to-version', dest='snapshot_version', type=int, default=None,
+            help='Snapshot version to roll back to (defaults to the previous one).'
+        )
+
+    def handle(self, *args, **options):
+        if options['all']:
+            options['locale'] = list(Language.objects.filter(is_active=True).values_list('code', flat=True))
+
+        if not options['locale']:
+            raise CommandError('No locales specified. Use --locale or --all.')
+
+        for lang_code in options['locale']:
+            try:
+                if options['rollback']:
+                    snapshot = rollback_catalog(lang_code, options['snapshot_version'])
+                    message = f"Rolled back '{lang_code}' to version {snapshot.version}"
+                else:
+                    snapshot = publish_catalog(lang_code, options['note'])
+                    message = f"Published '{lang_code}' version {snapshot.version} ({snapshot.message_count} strings)"
+            except Language.DoesNotExist:
+                raise CommandError(f"Language '{lang_code}' does not exist")
+            except ValueError as e:
+                raise CommandError(str(e))
+
+            self.stdout.write(self.style.SUCCESS(message))
@@ -1,19 +1,95 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
 from django.utils import translation
-from .translation import activate_db_translation
-from django.utils.translation import trans_real
-import functools
+from .translation import activate_db_translation, db_translation
+from .namespaces import get_namespace_resolver
+from .tenancy import get_tenant_resolver
+from .translation_memory import translation_memory
+
 
 class DatabaseTranslationMiddleware:
     """
     Middleware that activates database translations.
+
+    Under ASGI, the catalog of the request's language is loaded in the
+    database thread before the view runs, so a cold catalog never blocks the
+    event loop.
+
+    Catalog namespaces are picked once the view is resolved, so a view only
+    loads the namespaces it looks up on top of the default catalog.
     """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
-        # Store original translation function
-        trans_real._original_translation = trans_real.translation
+        self.tenant_resolver = get_tenant_resolver()
+        self.namespace_resolver = get_namespace_resolver()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # Django awaits view middleware that is a coroutine function
+            self.process_view = self.aprocess_view
         # Activate database translation backend
         activate_db_translation()
+        if getattr(settings, 'DB_TRANSLATIONS_MEMORY_PREWARM', False):
+            # Build translation memories for the admin before it's first used
+            translation_memory.prewarm()
+
+    def prepare_request(self, request):
+        """
+        Refresh catalogs changed by other processes and resolve the tenant of
+        the request. Returns the refreshed language codes and the tenant.
+        """
+        refreshed = db_translation.refresh_catalogs()
+        tenant = self.tenant_resolver(request) if self.tenant_resolver else None
+        return refreshed, tenant
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.namespace_resolver is not None:
+            db_translation.set_namespaces(self.namespace_resolver(request))
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if self.namespace_resolver is not None:
+            db_translation.set_namespaces(self.namespace_resolver(request))
+            # LocaleMiddleware has activated the request's language by now
+            await db_translation.aprepare([translation.get_language()])
         
     def __call__(self, request):
-        response = self.get_response(request)
+        if self.async_mode:
+            return self.__acall__(request)
+
+        refreshed, tenant = self.prepare_request(request)
+        current_language = translation.get_language()
+        if current_language in refreshed:
+            # The active translation object was built from the old catalog
+            translation.activate(current_language)
+
+        # Serve the tenant's overrides on top of the shared base catalog
+        if self.tenant_resolver is not None:
+            db_translation.set_tenant(tenant)
+        try:
+            response = self.get_response(request)
+        finally:
+            db_translation.set_tenant(None)
+            db_translation.set_namespaces(())
+        return response
+
+    async def __acall__(self, request):
+        refreshed, tenant = await sync_to_async(self.prepare_request)(request)
+
+        db_translation.set_tenant(tenant)
+        try:
+            # Load the catalogs and tenant overlays of the active language and
+            # of the language the request asks for (which LocaleMiddleware is
+            # about to activate)
+            current_language = translation.get_language()
+            await db_translation.aprepare([current_language, translation.get_language_from_request(request)])
+            if current_language in refreshed:
+                translation.activate(current_language)
+
+            response = await self.get_response(request)
+        finally:
+            db_translation.set_tenant(None)
+            db_translation.set_namespaces(())
         return response
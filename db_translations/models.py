@@ -9,6 +9,14 @@ class Language(models.Model):
     code = models.CharField(max_length=10, unique=True, help_text="Language code (e.g., 'en', 'es-mx')")
     name = models.CharField(max_length=50, help_text="Human-readable language name")
     is_active = models.BooleanField(default=True, help_text="Whether this language is active for translation")
+    published_snapshot = models.ForeignKey(
+        'CatalogSnapshot',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        help_text="Catalog snapshot served when snapshot publishing is enabled"
+    )
     
     class Meta:
         ordering = ['code']
@@ -43,18 +51,81 @@ class Translation(models.Model):
         blank=True, 
         help_text="File location where this string was found"
     )
+    namespace = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        help_text="Domain or app namespace, loaded on demand; empty for the default namespace that is always loaded"
+    )
+    last_seen_run = models.CharField(
+        max_length=32,
+        blank=True,
+        default='',
+        help_text="Id of the last makemessages_db run that found this string in the code"
+    )
+    fuzzy = models.BooleanField(
+        default=False,
+        help_text="Suggested translation that needs review; fuzzy translations are not served"
+    )
+    tenant = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        help_text="Tenant or site key this override applies to; empty for the shared base catalog"
+    )
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
-        unique_together = ('language', 'message_id', 'context')
+        unique_together = ('language', 'message_id', 'context', 'tenant', 'namespace')
         ordering = ['language', 'message_id']
         verbose_name = 'Translation'
         verbose_name_plural = 'Translations'
         indexes = [
             models.Index(fields=['message_id']),
             models.Index(fields=['language', 'message_id']),
+            models.Index(fields=['language', 'tenant']),
+            models.Index(fields=['language', 'namespace']),
+            models.Index(fields=['language', 'last_seen_run']),
+            models.Index(fields=['language', 'updated_at']),
+            # Partial index backing the admin's "untranslated" filter
+            models.Index(
+                fields=['language'],
+                condition=models.Q(translation=''),
+                name='db_trans_untranslated_idx',
+            ),
         ]
     
     def __str__(self):
         return f"{self.message_id[:30]}... ({self.language.code})"
+
+
+
+class CatalogSnapshot(models.Model):
+    """
+    Immutable, published copy of a language's catalog.
+    """
+    language = models.ForeignKey(
+        Language,
+        on_delete=models.CASCADE,
+        related_name='snapshots'
+    )
+    version = models.PositiveIntegerField(help_text="Version number, increasing per language")
+    data = models.BinaryField(help_text="Compressed serialised catalog: key list digest and values per namespace")
+    keys = models.BinaryField(
+        blank=True,
+        default=b'',
+        help_text="Compressed key lists of the catalog by digest, only read by processes that don't have them yet"
+    )
+    message_count = models.PositiveIntegerField(default=0)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('language', 'version')
+        ordering = ['language', '-version']
+        verbose_name = 'Catalog snapshot'
+        verbose_name_plural = 'Catalog snapshots'
+
+    def __str__(self):
+        return f"{self.language.code} v{self.version}"
@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .translation import db_translation
+
+
+def get_namespace_resolver():
+    """
+    Get the callable configured in DB_TRANSLATIONS_NAMESPACE_RESOLVER, which
+    takes a request and returns the namespaces its view looks up
+    """
+    resolver = getattr(
+        settings, 'DB_TRANSLATIONS_NAMESPACE_RESOLVER', 'db_translations.namespaces.namespaces_from_url'
+    )
+    if isinstance(resolver, str):
+        resolver = import_string(resolver)
+    return resolver
+
+
+def namespaces_from_url(request):
+    """Use the application namespaces of the resolved URL, e.g. ['shop'] for 'shop:cart'"""
+    resolver_match = getattr(request, 'resolver_match', None)
+    return resolver_match.app_names if resolver_match else []
+
+
+@contextmanager
+def override_namespaces(namespaces):
+    """
+    Look up the given namespaces before the default namespace inside the
+    block, e.g. in management commands or background tasks
+    """
+    previous = db_translation.get_namespaces()
+    db_translation.set_namespaces(namespaces)
+    try:
+        yield
+    finally:
+        db_translation.set_namespaces(previous)
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.query import QuerySet
+from django.utils.functional import cached_property
+
+
+def estimate_row_count(model, using=DEFAULT_DB_ALIAS):
+    """
+    Return the planner's row estimate for a model's table, or None when the
+    database backend doesn't expose one (e.g. SQLite).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+                [connection.ops.quote_name(table)]
+            )
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                [table]
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+
+    # PostgreSQL reports -1 for tables that have never been analyzed
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the database's row estimate instead of an exact
+    COUNT(*) for unfiltered querysets on large tables.
+
+    Filtered querysets, small tables and backends without statistics still
+    get an exact count.
+    """
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            threshold = getattr(settings, 'DB_TRANSLATIONS_ADMIN_ESTIMATED_COUNT_THRESHOLD', 100000)
+            estimate = estimate_row_count(queryset.model, using=queryset.db)
+            if estimate is not None and estimate >= threshold:
+                return estimate
+        return super().count
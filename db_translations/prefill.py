@@ -0,0 +1,47 @@
+"""
+Worker side of the prefill_translations command.
+
+Matching strings against a translation memory is pure Python CPU work, so
+batches are matched in worker processes rather than threads. Each worker
+builds its own copy of the memory once, from the entries the command
+passes to init_worker(). Workers are spawned, so this module is imported
+before Django is set up and only touches the app registry after setup().
+"""
+import django
+
+# Memory of the language being pre-filled, in a worker process
+_memory = None
+
+
+def init_worker(entries):
+    """Set up Django in a worker process and index the memory entries it matches against"""
+    global _memory
+    django.setup()
+    # Imports models, which needs the app registry set up above
+    from .translation_memory import TranslationMemory
+
+    _memory = TranslationMemory()
+    for entry in entries:
+        _memory.add(*entry)
+
+
+def match_rows(memory, rows, min_score):
+    """
+    Return (pk, translation, fuzzy) tuples for the (pk, message_id, context)
+    rows that have a suggestion of at least min_score in the memory
+    """
+    results = []
+    for pk, message_id, context in rows:
+        suggestions = memory.suggest(message_id, limit=1, min_score=min_score)
+        if suggestions:
+            best = suggestions[0]
+            # Only an identical source string in the same context is safe to
+            # serve without review
+            exact = best.score == 1.0 and best.message_id == message_id and best.context == context
+            results.append((pk, best.translation, not exact))
+    return results
+
+
+def match_batch(rows, min_score):
+    """Match a batch of rows against the memory of this worker process"""
+    return match_rows(_memory, rows, min_score)
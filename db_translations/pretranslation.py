@@ -0,0 +1,164 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .translation import db_translation
+from .translation_memory import translation_memory
+from .utils import imap_bounded, iter_untranslated_chunks, save_translations
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderError(Exception):
+    """A temporary provider failure, e.g. a timeout or a rate limit response; the batch is retried"""
+
+
+class TranslationProvider:
+    """
+    Interface of machine translation backends used by the pretranslate
+    command. Subclasses implement translate(); options from
+    DB_TRANSLATIONS_PRETRANSLATE_OPTIONS are passed to the constructor.
+    """
+    # Messages sent per request
+    batch_size = 50
+
+    def __init__(self, **options):
+        self.options = options
+
+    def translate(self, messages, source_language, target_language):
+        """
+        Translate a batch of (message_id, context) tuples and return a list
+        of translations in the same order. Empty strings or None leave a
+        message untranslated. Raise ProviderError for failures worth retrying.
+        """
+        raise NotImplementedError('Subclasses of TranslationProvider must implement translate()')
+
+
+class StubProvider(TranslationProvider):
+    """
+    Offline provider that marks messages with the target language, for
+    trying and load testing the pipeline without a translation service.
+
+    Options: latency (seconds per request) and failure_rate (share of
+    requests failing with ProviderError).
+    """
+    def __init__(self, latency=0, failure_rate=0, **options):
+        super().__init__(**options)
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    def translate(self, messages, source_language, target_language):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise ProviderError('Simulated provider failure')
+        return [f"[{target_language}] {message_id}" for message_id, context in messages]
+
+
+def get_provider(path=None):
+    """
+    Get an instance of the provider configured in
+    DB_TRANSLATIONS_PRETRANSLATE_PROVIDER, or of the given dotted path
+    """
+    path = path or getattr(
+        settings, 'DB_TRANSLATIONS_PRETRANSLATE_PROVIDER', 'db_translations.pretranslation.StubProvider'
+    )
+    options = getattr(settings, 'DB_TRANSLATIONS_PRETRANSLATE_OPTIONS', {})
+    return import_string(path)(**options)
+
+
+class RateLimiter:
+    """Spaces out calls from any number of threads to at most `rate` per second"""
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def pretranslate_language(language, provider, source_language=None, batch_size=None, workers=4,
+                          rate_limit=None, retries=3, fuzzy=True, dry_run=False):
+    """
+    Machine translate the untranslated base rows of a language and return
+    the numbers of strings translated and of batches that failed.
+
+    Rows are streamed in chunks and sent to the provider in batches from a
+    bounded thread pool, so at most `workers * 2` batches are held in memory.
+    Results are written to the rows that are still untranslated and marked
+    fuzzy unless `fuzzy` is False; the catalog of the language is
+    invalidated once at the end, even if writing a later batch fails.
+
+    A batch fails when the provider keeps raising ProviderError, raises any
+    other exception, or returns a different number of translations than it
+    was sent. Failed batches are logged and skipped.
+
+    Raises ValueError unless batch_size and workers are at least 1 and
+    retries is at least 0.
+    """
+    source_language = source_language or settings.LANGUAGE_CODE
+    batch_size = batch_size or provider.batch_size
+    if batch_size < 1 or workers < 1 or retries < 0:
+        raise ValueError(
+            f"Invalid pretranslation options: batch_size={batch_size}, workers={workers}, retries={retries}"
+        )
+    limiter = RateLimiter(rate_limit)
+
+    def translate_batch(rows):
+        messages = [(message_id, context) for pk, message_id, context in rows]
+        for attempt in range(retries + 1):
+            limiter.wait()
+            try:
+                translated = provider.translate(messages, source_language, language.code)
+                break
+            except ProviderError as e:
+                if attempt == retries:
+                    logger.warning("Giving up on a batch of %d strings for '%s': %s", len(rows), language.code, e)
+                    return None
+                # Exponential backoff with jitter
+                time.sleep(min(2 ** attempt, 30) * random.uniform(0.5, 1))
+            except Exception:
+                # Not worth retrying, but other batches may still succeed
+                logger.exception("Provider failed on a batch of %d strings for '%s'", len(rows), language.code)
+                return None
+
+        if translated is None or len(translated) != len(rows):
+            logger.warning(
+                "Provider returned %s translations for a batch of %d strings for '%s'",
+                'no' if translated is None else len(translated), len(rows), language.code,
+            )
+            return None
+        return [(row[0], result) for row, result in zip(rows, translated) if result]
+
+    translated_count = 0
+    written = 0
+    failed = 0
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            chunks = iter_untranslated_chunks(language, batch_size)
+            for results in imap_bounded(executor, translate_batch, chunks, max(workers, 1) * 2):
+                if results is None:
+                    failed += 1
+                    continue
+                translated_count += len(results)
+                if results and not dry_run:
+                    written += save_translations(results, fuzzy=fuzzy, batch_size=batch_size)
+    finally:
+        if written:
+            # One invalidation for the whole language instead of one per row
+            db_translation.invalidate_catalog(language.code)
+            translation_memory.touch(language.code)
+
+    return translated_count, failed
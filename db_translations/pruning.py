@@ -0,0 +1,107 @@
+import json
+from django.db import connections, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from .models import Translation
+from .translation import db_translation
+from .translation_memory import translation_memory
+
+# Fields written for each row by archive_rows
+ARCHIVE_FIELDS = ('pk', 'message_id', 'context', 'namespace', 'translation', 'location', 'fuzzy', 'last_seen_run')
+
+
+def new_extraction_run_id():
+    """
+    Create the id makemessages_db stamps on every row it sees. Ids sort in
+    the order the runs were made.
+    """
+    return timezone.now().strftime('%Y%m%d%H%M%S%f')
+
+
+def unseen_translations(language):
+    """
+    Get the base rows of a language that the latest extraction run of their
+    namespace didn't see. Namespaces that were never extracted are left alone.
+    """
+    latest_runs = Translation.objects.filter(language=language, tenant='').exclude(
+        last_seen_run=''
+    ).values('namespace').annotate(latest=Max('last_seen_run'))
+
+    condition = Q()
+    for row in latest_runs:
+        condition |= Q(namespace=row['namespace'], last_seen_run__lt=row['latest'])
+    if not condition:
+        return Translation.objects.none()
+    return Translation.objects.filter(condition, language=language, tenant='')
+
+
+def archive_rows(rows, language, archive):
+    """Write pruned rows to a file object as JSON lines"""
+    for row in rows:
+        archive.write(json.dumps({'language': language.code, **row}, ensure_ascii=False) + '\n')
+
+
+def delete_rows(pks, using=None):
+    """
+    Delete translation rows with a single DELETE statement, without loading
+    them or sending signals. Refuses to run once other models point at
+    Translation, since their rows would then need the ORM's cascades.
+    """
+    # Reverse relations and many-to-many tables hold rows that point here
+    related = [
+        field.name for field in Translation._meta.get_fields()
+        if (field.auto_created and not field.concrete) or field.many_to_many
+    ]
+    if related:
+        raise ValueError(
+            f"Translation rows can't be deleted in bulk while other models refer to them: {related}"
+        )
+
+    using = using or Translation.objects.db
+    connection = connections[using]
+    placeholders = ', '.join(['%s'] * len(pks))
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {connection.ops.quote_name(Translation._meta.db_table)} "
+            f"WHERE {connection.ops.quote_name(Translation._meta.pk.column)} IN ({placeholders})",
+            list(pks),
+        )
+        return cursor.rowcount
+
+
+def prune_language(language, chunk_size=1000, archive=None, dry_run=False):
+    """
+    Delete the unseen rows of a language in chunks, optionally archiving
+    them first, and return how many there were.
+
+    Rows are deleted with one statement per chunk and without per-row
+    signals; the catalog and translation memory of the language are reset
+    once at the end instead.
+    """
+    queryset = unseen_translations(language).order_by('pk')
+    # Stay below the number of parameters the database accepts per statement
+    max_params = connections[Translation.objects.db].features.max_query_params
+    if max_params:
+        chunk_size = min(chunk_size, max_params)
+    last_pk = None
+    pruned = 0
+
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk.values(*ARCHIVE_FIELDS)[:chunk_size])
+        if not rows:
+            break
+
+        pks = [row['pk'] for row in rows]
+        if archive is not None:
+            archive_rows(rows, language, archive)
+        if not dry_run:
+            delete_rows(pks)
+        pruned += len(rows)
+        last_pk = pks[-1]
+
+    if pruned and not dry_run:
+        db_translation.invalidate_catalog(language.code)
+        translation_memory.reset(language.code)
+
+    return pruned
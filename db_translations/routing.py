@@ -0,0 +1,67 @@
+import logging
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+
+def get_replica_lag(alias):
+    """
+    Return how many seconds the database behind an alias lags behind its
+    primary, 0 for a primary, or None when the backend can't tell.
+    """
+    connection = connections[alias]
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # An idle replica that has replayed everything it received isn't lagging,
+            # however old its last replayed transaction is
+            cursor.execute(
+                "SELECT CASE WHEN NOT pg_is_in_recovery() "
+                "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+            )
+            row = cursor.fetchone()
+            return float(row[0]) if row and row[0] is not None else None
+
+        if connection.vendor == 'mysql':
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except DatabaseError:
+                # Before MySQL 8.0.22 and MariaDB 10.5.1; the old statement
+                # is gone in MySQL 8.4
+                cursor.execute("SHOW SLAVE STATUS")
+            row = cursor.fetchone()
+            if not row:
+                return 0
+            status = dict(zip([column[0] for column in cursor.description], row))
+            # MariaDB kept the old column name for the new statement
+            lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+            return float(lag) if lag is not None else None
+
+    return None
+
+
+def get_read_alias():
+    """
+    Get the database alias catalogs are read from.
+
+    This is DB_TRANSLATIONS_DATABASE, unless DB_TRANSLATIONS_REPLICA_MAX_LAG
+    is set and that database is further behind (or can't be asked), in
+    which case reads go to the primary.
+    """
+    alias = getattr(settings, 'DB_TRANSLATIONS_DATABASE', DEFAULT_DB_ALIAS)
+    max_lag = getattr(settings, 'DB_TRANSLATIONS_REPLICA_MAX_LAG', None)
+    if alias == DEFAULT_DB_ALIAS or max_lag is None:
+        return alias
+
+    try:
+        lag = get_replica_lag(alias)
+    except DatabaseError as e:
+        logger.warning("Could not check replication lag of '%s', reading from primary: %s", alias, e)
+        return DEFAULT_DB_ALIAS
+
+    if lag is not None and lag > max_lag:
+        logger.info("Database '%s' is %.1fs behind, reading catalogs from primary", alias, lag)
+        return DEFAULT_DB_ALIAS
+    return alias
@@ -0,0 +1,53 @@
+import json
+import os
+import tempfile
+import zlib
+
+
+def dump_catalog(translations):
+    """
+    Serialise a translations dictionary into a compact compressed blob
+    """
+    if not isinstance(translations, dict):
+        # e.g. an InternedCatalog
+        translations = dict(translations.items())
+    payload = json.dumps(translations, ensure_ascii=False, separators=(',', ':'))
+    return zlib.compress(payload.encode('utf-8'))
+
+
+def load_catalog(data):
+    """
+    Deserialise a blob created by dump_catalog back into a dictionary
+    """
+    # Database drivers may hand back a memoryview for binary fields
+    return json.loads(zlib.decompress(bytes(data)).decode('utf-8'))
+
+
+def write_catalog_file(path, translations):
+    """
+    Atomically write a translations dictionary to a local file, so readers
+    never see a partially written catalog
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(dump_catalog(translations))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def read_catalog_file(path):
+    """
+    Read a translations dictionary written by write_catalog_file, or return
+    None if there is no such file
+    """
+    try:
+        with open(path, 'rb') as f:
+            return load_catalog(f.read())
+    except FileNotFoundError:
+        return None
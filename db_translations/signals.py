@@ -1,18 +1,68 @@
-from django.db.models.signals import post_save, post_delete
+import logging
+from django.db import DatabaseError, connections
+from django.db.models.signals import post_save, post_delete, post_migrate, pre_save
 from django.dispatch import receiver
 from django.core.cache import cache
 from .models import Translation, Language
 from .translation import db_translation
+from .translation_memory import translation_memory
 from .constants import TRANSLATION_CACHE_KEY_PREFIX
 
+logger = logging.getLogger(__name__)
+
+
+def _invalidate_scope(lang_code, tenant, namespace):
+    if tenant:
+        # Tenant overrides are kept out of the base catalog and its snapshots
+        db_translation.reset_tenant_overlay(lang_code, tenant)
+        return
+
+    # Reset both cache and in-memory translations, unless edits are drafts
+    # until the catalog is published
+    db_translation.invalidate_catalog(lang_code, namespace)
+
+
+@receiver(pre_save, sender=Translation)
+def remember_translation_scope(sender, instance, raw=False, **kwargs):
+    """
+    Remember the catalog an existing row was stored in, since the language,
+    tenant and namespace can all be changed in the admin
+    """
+    instance._previous_scope = None
+    if instance.pk is not None and not raw:
+        instance._previous_scope = Translation.objects.filter(pk=instance.pk).values_list(
+            'language__code', 'tenant', 'namespace'
+        ).first()
+
 
 @receiver([post_save, post_delete], sender=Translation)
 def invalidate_translation_cache(sender, instance, **kwargs):
     """
-    Clear the cache for specific language translations when a translation is updated or deleted
+    Clear the cache for specific language translations when a translation is
+    updated or deleted. A row moved to another catalog is also dropped from
+    the one it was in.
+    """
+    scope = (instance.language.code, instance.tenant, instance.namespace)
+    previous_scope = getattr(instance, '_previous_scope', None)
+    if previous_scope and previous_scope != scope:
+        _invalidate_scope(*previous_scope)
+    _invalidate_scope(*scope)
+
+
+@receiver(post_save, sender=Translation)
+def index_translation_memory(sender, instance, **kwargs):
+    """
+    Keep the translation memory of the language in sync with saved translations
     """
-    # Use the DatabaseTranslation method to reset both cache and in-memory translations
-    db_translation.reset_translation_cache(instance.language.code)
+    translation_memory.update(instance)
+
+
+@receiver(post_delete, sender=Translation)
+def unindex_translation_memory(sender, instance, **kwargs):
+    """
+    Drop deleted translations from the translation memory of the language
+    """
+    translation_memory.remove(instance)
 
 
 @receiver([post_save, post_delete], sender=Language)
@@ -22,3 +72,45 @@ def invalidate_language_cache(sender, instance, **kwargs):
     """
     # Reset all translations when language changes
     db_translation.reset_translation_cache()
+
+
+@receiver(post_migrate)
+def create_search_indexes(sender, using='default', **kwargs):
+    """
+    Create trigram indexes for the admin search on PostgreSQL.
+
+    Django's icontains lookup compiles to UPPER(column) LIKE UPPER(%s), so the
+    indexes are built on the same expression. They're built concurrently, so
+    writes to a large table aren't blocked on the first deploy; post_migrate
+    doesn't run inside a transaction. Other backends fall back to a plain
+    scan and are left alone.
+    """
+    if getattr(sender, 'name', None) != 'db_translations':
+        return
+
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+
+    table = connection.ops.quote_name(Translation._meta.db_table)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for column in ('message_id', 'translation'):
+                index = f"db_trans_{column}_trgm_idx"
+                # An interrupted concurrent build leaves an invalid index
+                # behind, which IF NOT EXISTS would keep forever
+                cursor.execute(
+                    "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+                    "WHERE c.relname = %s AND NOT i.indisvalid",
+                    [index],
+                )
+                if cursor.fetchone():
+                    cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index}")
+                cursor.execute(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index} "
+                    f"ON {table} USING gin (UPPER({connection.ops.quote_name(column)}) gin_trgm_ops)"
+                )
+    except DatabaseError as e:
+        # Usually a missing privilege to create the extension
+        logger.warning("Could not create trigram search indexes: %s", e)
@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models import Max
+from .models import CatalogSnapshot, Language
+from .interning import pack_catalog
+from .serialization import dump_catalog
+from .translation import db_translation
+
+
+def publish_catalog(lang_code, note=''):
+    """
+    Publish the current translations of a language, all namespaces
+    included, as a new immutable snapshot and make it the current version.
+    """
+    with transaction.atomic():
+        language = Language.objects.select_for_update().get(code=lang_code)
+        catalogs = db_translation.build_namespaced_catalogs(language)
+        latest = language.snapshots.aggregate(latest=Max('version'))['latest'] or 0
+
+        # Keys are stored apart from the values, so loading a snapshot
+        # doesn't decode key lists a process already has
+        packed = {}
+        keys = {}
+        for namespace, translations in catalogs.items():
+            digest, keys[digest], values = pack_catalog(translations)
+            packed[namespace] = [digest, values]
+
+        snapshot = CatalogSnapshot.objects.create(
+            language=language,
+            version=latest + 1,
+            data=dump_catalog(packed),
+            keys=dump_catalog(keys),
+            message_count=sum(len(translations) for translations in catalogs.values()),
+            note=note[:255],
+        )
+        _point_language_at(language, snapshot)
+
+    return snapshot
+
+
+def rollback_catalog(lang_code, version=None):
+    """
+    Make an earlier snapshot of a language current again. Without a version,
+    the snapshot published before the current one is restored.
+    """
+    with transaction.atomic():
+        language = Language.objects.select_for_update().get(code=lang_code)
+        snapshots = language.snapshots.all()
+
+        if version is not None:
+            snapshot = snapshots.filter(version=version).first()
+        elif language.published_snapshot_id:
+            current = snapshots.get(pk=language.published_snapshot_id)
+            snapshot = snapshots.filter(version__lt=current.version).order_by('-version').first()
+        else:
+            snapshot = None
+
+        if snapshot is None:
+            raise ValueError(f"No snapshot to roll back to for language '{lang_code}'")
+
+        _point_language_at(language, snapshot)
+
+    return snapshot
+
+
+def _point_language_at(language, snapshot):
+    """
+    Flip the language's published snapshot pointer. This deliberately uses
+    update() so Language signals don't flush every cached catalog.
+    """
+    Language.objects.filter(pk=language.pk).update(published_snapshot=snapshot)
+    transaction.on_commit(
+        lambda: db_translation.set_published_version(language.code, snapshot.pk)
+    )
@@ -0,0 +1,166 @@
+"""
+Drop-in replacement for Django's i18n template library that caches the
+result of static translate and blocktranslate tags.
+
+Load it with {% load db_i18n %} instead of {% load i18n %}. Cached results
+are keyed by the language, the version of its loaded catalog and the active
+namespaces, so any invalidation of the catalog shows up on the next render.
+"""
+from django import template
+from django.template.base import Variable, render_value_in_context
+from django.templatetags import i18n
+from django.utils import translation
+from django.utils.safestring import SafeString
+from ..translation import db_translation
+
+register = template.Library()
+register.tags.update(i18n.register.tags)
+register.filters.update(i18n.register.filters)
+
+# Cached variants kept per node; old catalog versions are dropped with them
+MAX_CACHED_VARIANTS = 32
+
+
+def _lookup_key(message_context, message):
+    """Build the catalog key for a message, as the translation engine does"""
+    return f"{message_context}\x04{message}" if message_context else message
+
+
+def _static_message_context(message_context):
+    """
+    Return (is_static, value) for a tag's message context, which is static
+    when it's absent or a plain string literal
+    """
+    if message_context is None:
+        return True, None
+    if isinstance(message_context.var, str) and not message_context.filters:
+        return True, message_context.var
+    return False, None
+
+
+def _store(cache, key, value):
+    if len(cache) >= MAX_CACHED_VARIANTS:
+        cache.clear()
+    cache[key] = value
+
+
+class CachedTranslateNode(i18n.TranslateNode):
+    """
+    {% translate %} node that renders a string literal once per language,
+    catalog version, set of active namespaces and autoescape setting
+    """
+    def __init__(self, filter_expression, noop, asvar=None, message_context=None):
+        super().__init__(filter_expression, noop, asvar, message_context)
+        self.lookup_key = self._get_lookup_key()
+        self._rendered = {}
+
+    def _get_lookup_key(self):
+        var = self.filter_expression.var
+        if self.noop or self.filter_expression.filters or not isinstance(var, Variable) or var.literal is None:
+            return None
+        is_static, message_context = _static_message_context(self.message_context)
+        if not is_static:
+            return None
+        # Variable doubles percent signs before looking up a literal
+        return _lookup_key(message_context, str(var.literal).replace('%', '%%'))
+
+    def render(self, context):
+        language = translation.get_language()
+        version = None
+        if self.lookup_key is not None and language:
+            version = db_translation.get_catalog_version(language, self.lookup_key)
+        if version is None:
+            return super().render(context)
+
+        cache_key = (language, version, db_translation.get_namespaces(), context.autoescape)
+        value = self._rendered.get(cache_key)
+        if value is None:
+            output = super().render(context)
+            _store(self._rendered, cache_key, context[self.asvar] if self.asvar else output)
+            return output
+
+        if self.asvar:
+            context[self.asvar] = value
+            return ''
+        return value
+
+
+class CachedBlockTranslateNode(i18n.BlockTranslateNode):
+    """
+    {% blocktranslate %} node that looks up the translated format string once
+    per language, catalog version and set of active namespaces, so only the variable substitution runs
+    on each render. Plural blocks are rendered as usual.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lookup_key = None
+        self._translated = {}
+
+        is_static, self.static_context = _static_message_context(self.message_context)
+        if is_static and not self.plural:
+            self.format_string, self.vars = self.render_token_list(self.singular)
+            self.lookup_key = _lookup_key(self.static_context, self.format_string)
+
+    def render(self, context, nested=False):
+        language = translation.get_language()
+        version = None
+        if self.lookup_key is not None and language and not nested:
+            version = db_translation.get_catalog_version(language, self.lookup_key)
+        if version is None:
+            return super().render(context, nested)
+
+        cache_key = (language, version, db_translation.get_namespaces())
+        result = self._translated.get(cache_key)
+        if result is None:
+            if self.static_context:
+                result = translation.pgettext(self.static_context, self.format_string)
+            else:
+                result = translation.gettext(self.format_string)
+            _store(self._translated, cache_key, result)
+
+        context.update({var: val.resolve(context) for var, val in self.extra_context.items()})
+        default_value = context.template.engine.string_if_invalid
+
+        def render_value(key):
+            if key in context:
+                val = context[key]
+            else:
+                val = default_value % key if '%s' in default_value else default_value
+            return render_value_in_context(val, context)
+
+        data = {var: render_value(var) for var in self.vars}
+        context.pop()
+        try:
+            result %= data
+        except (KeyError, ValueError):
+            # Let Django report or work around the malformed translation
+            return super().render(context, nested)
+
+        if self.asvar:
+            context[self.asvar] = SafeString(result)
+            return ''
+        return result
+
+
+@register.tag('translate')
+@register.tag('trans')
+def do_translate(parser, token):
+    node = i18n.do_translate(parser, token)
+    return CachedTranslateNode(node.filter_expression, node.noop, node.asvar, node.message_context)
+
+
+@register.tag('blocktranslate')
+@register.tag('blocktrans')
+def do_block_translate(parser, token):
+    node = i18n.do_block_translate(parser, token)
+    return CachedBlockTranslateNode(
+        node.extra_context,
+        node.singular,
+        node.plural,
+        node.countervar,
+        node.counter,
+        message_context=node.message_context,
+        trimmed=node.trimmed,
+        asvar=node.asvar,
+        tag_name=node.tag_name,
+    )
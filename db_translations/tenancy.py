@@ -0,0 +1,40 @@
+from contextlib import contextmanager
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .translation import db_translation
+
+
+def get_tenant_resolver():
+    """
+    Get the callable configured in DB_TRANSLATIONS_TENANT_RESOLVER, which
+    takes a request and returns its tenant key (or None for the base catalog)
+    """
+    resolver = getattr(settings, 'DB_TRANSLATIONS_TENANT_RESOLVER', None)
+    if isinstance(resolver, str):
+        resolver = import_string(resolver)
+    return resolver
+
+
+def tenant_from_host(request):
+    """Use the request's host name, without port, as the tenant key"""
+    return request.get_host().split(':')[0].lower()
+
+
+def tenant_from_site(request):
+    """Use the domain of the current django.contrib.sites Site as the tenant key"""
+    from django.contrib.sites.shortcuts import get_current_site
+    return get_current_site(request).domain
+
+
+@contextmanager
+def override_tenant(tenant):
+    """
+    Resolve lookups for the given tenant inside the block, e.g. in
+    management commands or background tasks
+    """
+    previous = db_translation.get_tenant()
+    db_translation.set_tenant(tenant)
+    try:
+        yield
+    finally:
+        db_translation.set_tenant(previous)
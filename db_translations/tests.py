@@ -1,9 +1,36 @@
-from django.test import TestCase, override_settings
+import asyncio
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.contrib import admin
+from django.core.management import CommandError, call_command
+from django.template import Context, Template
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase, override_settings
 from django.core.cache import cache
-from django.utils import translation
-from .models import Language, Translation
+from django.db import OperationalError
+from django.utils import timezone, translation
+from django.utils.translation import trans_real
+from django.utils.safestring import SafeData, mark_safe
+from .models import CatalogSnapshot, Language, Translation
+from .serialization import dump_catalog
 from .constants import TRANSLATION_CACHE_KEY_PREFIX
-from .translation import activate_db_translation
+from .translation import activate_db_translation, db_translation
+from .snapshots import publish_catalog, rollback_catalog
+from .tenancy import override_tenant
+from .namespaces import override_namespaces
+from .middleware import DatabaseTranslationMiddleware
+from .translation_memory import TranslationMemory, translation_memory
+from .interning import InternedCatalog, KeyTable
+from .admin import LanguageAdmin, TranslationAdmin
+from .paginator import EstimatedCountPaginator
+from .routing import get_replica_lag
+from .pruning import delete_rows, prune_language, unseen_translations
+from .batch import get_translator, gettext_many, pgettext_many
+from .pretranslation import ProviderError, StubProvider, TranslationProvider, pretranslate_language
+from .utils import create_temp_po_file, extract_messages_from_po_file, iter_untranslated_chunks, save_translations
 
 
 class LanguageModelTestCase(TestCase):
@@ -119,3 +146,818 @@ class DatabaseTranslationTestCase(TestCase):
         # New translation should be used
         with translation.override('es'):
             self.assertEqual(translation.gettext('Hello world'), 'Hola a todos')
+
+
+class AdminPerformanceTestCase(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        for code in ('en', 'es', 'fr'):
+            language = Language.objects.create(code=code, name=code, is_active=True)
+            Translation.objects.create(language=language, message_id='Hello', translation='Hi')
+            Translation.objects.create(language=language, message_id='Bye', translation='')
+
+    def test_language_translation_count_is_annotated(self):
+        model_admin = LanguageAdmin(Language, admin.site)
+        request = self.factory.get('/')
+        with self.assertNumQueries(1):
+            counts = [model_admin.translation_count(obj) for obj in model_admin.get_queryset(request)]
+        self.assertEqual(counts, [2, 2, 2])
+
+    def get_changelist_queryset(self, **params):
+        request = self.factory.get('/', params)
+        request.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        changelist = TranslationAdmin(Translation, admin.site).get_changelist_instance(request)
+        return changelist.get_queryset(request)
+
+    def test_untranslated_filter(self):
+        messages = set(self.get_changelist_queryset(status='untranslated').values_list('message_id', flat=True))
+        self.assertEqual(messages, {'Bye'})
+
+    def test_search_only_matches_indexed_fields(self):
+        language = Language.objects.get(code='es')
+        Translation.objects.create(language=language, message_id='Cart', translation='Cesta', tenant='Hello')
+        queryset = self.get_changelist_queryset(q='Hello')
+        self.assertEqual(set(queryset.values_list('message_id', flat=True)), {'Hello'})
+        self.assertNotIn('tenant', str(queryset.query).split('WHERE')[1])
+
+    def test_exact_field_search(self):
+        language = Language.objects.get(code='es')
+        Translation.objects.create(language=language, message_id='Cart', translation='Cesta', tenant='brand-a')
+        queryset = self.get_changelist_queryset(q='tenant: brand-a')
+        self.assertEqual(list(queryset.values_list('message_id', flat=True)), ['Cart'])
+
+    def test_changelist_orders_by_language_column(self):
+        queryset = self.get_changelist_queryset()
+        order_by = str(queryset.query).split('ORDER BY')[1]
+        self.assertTrue(order_by.strip().startswith('"db_translations_translation"."language_id" ASC'))
+
+    def test_paginator_falls_back_to_exact_count(self):
+        # SQLite has no row estimate, so the exact count is used
+        paginator = EstimatedCountPaginator(Translation.objects.all(), 2)
+        self.assertEqual(paginator.count, 6)
+
+
+@override_settings(DB_TRANSLATIONS_USE_SNAPSHOTS=True)
+class CatalogSnapshotTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        db_translation.reset_translation_cache()
+        self.es = Language.objects.create(code='es', name='Spanish', is_active=True)
+        self.hello = Translation.objects.create(language=self.es, message_id='Hello world', translation='Hola mundo')
+        activate_db_translation()
+
+    def tearDown(self):
+        db_translation.reset_translation_cache()
+
+    def publish(self):
+        # Version pointers are flipped once the publishing transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            return publish_catalog('es')
+
+    def set_translation(self, text):
+        self.hello.translation = text
+        self.hello.save()
+
+    def test_drafts_are_not_served_until_published(self):
+        self.publish()
+        with translation.override('es'):
+            self.assertEqual(translation.gettext('Hello world'), 'Hola mundo')
+
+        self.set_translation('Hola a todos')
+        self.assertEqual(db_translation.refresh_published_versions(), set())
+        with translation.override('es'):
+            self.assertEqual(translation.gettext('Hello world'), 'Hola mundo')
+
+        snapshot = self.publish()
+        self.assertEqual(snapshot.version, 2)
+        self.assertEqual(db_translation.refresh_published_versions(), {'es'})
+        with translation.override('es'):
+            self.assertEqual(translation.gettext('Hello world'), 'Hola a todos')
+
+    def test_rollback_restores_previous_version(self):
+        self.publish()
+        self.set_translation('Hola a todos')
+        self.publish()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            snapshot = rollback_catalog('es')
+        self.assertEqual(snapshot.version, 1)
+        db_translation.refresh_published_versions()
+        with translation.override('es'):
+            self.assertEqual(translation.gettext('Hello world'), 'Hola mundo')
+
+        with self.assertRaises(ValueError):
+            rollback_catalog('es')
+
+    def test_rollback_past_versions_kept_in_memory(self):
+        for text in ('Hola mundo', 'Hola a todos', 'Buenas'):
+            self.set_translation(text)
+            self.publish()
+            db_translation.refresh_published_versions()
+            with translation.override('es'):
+                self.assertEqual(translation.gettext('Hello world'), text)
+
+        # Version 1 is older than the versions this process kept around
+        with self.captureOnCommitCallbacks(execute=True):
+            rollback_catalog('es', version=1)
+        db_translation.refresh_published_versions()
+        with translation.override('es'):
+            self.assertEqual(translation.gettext('Hello world'), 'Hola mundo')
+
+
+    def test_refresh_tolerates_concurrent_drops(self):
+        self.publish()
+        with translation.override('es'):
+            self.assertEqual(translation.gettext('Hello world'), 'Hola mundo')
+        self.set_translation('Hola a todos')
+        self.publish()
+
+        get_many = cache.get_many
+
+        def drop_meanwhile(keys):
+            # Another request refreshes the same language in the meantime
+            db_translation._drop_translation('es')
+            return get_many(keys)
+
+        with mock.patch.object(cache, 'get_many', side_effect=drop_meanwhile):
+            self.assertEqual(db_translation.refresh_published_versions(), {'es'})
+        with translation.override('es'):
+            self.assertEqual(translation.gettext('Hello world'), 'Hola a todos')
+
+
+class TenantOverlayTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        db_translation.reset_translation_cache()
+        self.es = Language.objects.create(code='es', name='Spanish', is_active=True)
+        Translation.objects.create(language=self.es, message_id='Hello world', translation='Hola mundo')
+        Translation.objects.create(language=self.es, message_id='Cart', translation='Carrito')
+        self.override = Translation.objects.create(
+            language=self.es, message_id='Hello world', translation='Hola, amigo', tenant='brand-a'
+        )
+        activate_db_translation()
+
+    def test_overlay_takes_precedence_over_base(self):
+        with translation.override('es'):
+            self.assertEqual(translation.gettext('Hello world'), 'Hola mundo')
+            with override_tenant('brand-a'):
+                self.assertEqual(translation.gettext('Hello world'), 'Hola, amigo')
+                # Strings without an override come from the shared base catalog
+                self.assertEqual(translation.gettext('Cart'), 'Carrito')
+            with override_tenant('brand-b'):
+                self.assertEqual(translation.gettext('Hello world'), 'Hola mundo')
+
+    def test_overlay_is_not_copied_into_base_catalog(self):
+        self.assertEqual(db_translation.fetch_translations_from_db('es')['Hello world'], 'Hola mundo')
+        self.assertEqual(db_translation.get_tenant_overlay('es', 'brand-a'), {'Hello world': 'Hola, amigo'})
+
+    def test_overlay_invalidation(self):
+        with translation.override('es'), override_tenant('brand-a'):
+            self.assertEqual(translation.gettext('Hello world'), 'Hola, amigo')
+            self.override.translation = 'Buenas'
+            self.override.save()
+            self.assertEqual(translation.gettext('Hello world'), 'Buenas')
+
+    def test_moving_row_between_tenants_invalidates_both(self):
+        def lookup(message, tenant=None):
+            with translation.override('es'), override_tenant(tenant):
+                return translation.gettext(message)
+
+        self.assertEqual((lookup('Cart'), lookup('Hello world', 'brand-a')), ('Carrito', 'Hola, amigo'))
+
+        cart = Translation.objects.get(message_id='Cart', tenant='')
+        cart.tenant = 'brand-a'
+        cart.save()
+        self.assertEqual((lookup('Cart'), lookup('Cart', 'brand-a')), ('Cart', 'Carrito'))
+
+        self.override.tenant = 'brand-b'
+        self.override.save()
+        self.assertEqual((lookup('Hello world', 'brand-a'), lookup('Hello world', 'brand-b')), ('Hola mundo', 'Hola, amigo'))
+
+
+class NamespaceTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        db_translation.reset_translation_cache()
+        self.es = Language.objects.create(code='es', name='Spanish', is_active=True)
+        Translation.objects.create(language=self.es, message_id='Cart', translation='Carrito')
+        self.shop = Translation.objects.create(
+            language=self.es, message_id='Cart', translation='Cesta', namespace='shop'
+        )
+        Translation.objects.create(language=self.es, message_id='Checkout', translation='Pagar', namespace='shop')
+        activate_db_translation()
+
+    def test_namespaces_are_loaded_on_demand(self):
+        with translation.override('es'):
+            self.assertEqual(translation.gettext('Cart'), 'Carrito')
+            self.assertEqual(translation.gettext('Checkout'), 'Checkout')
+            self.assertEqual(trans_real._translations['es']._db_namespaces, {})
+            with override_namespaces(['shop']):
+                self.assertEqual(translation.gettext('Cart'), 'Cesta')
+                self.assertEqual(translation.gettext('Checkout'), 'Pagar')
+            self.assertIn('shop', trans_real._translations['es']._db_namespaces)
+
+    def test_namespace_invalidation_keeps_default_catalog(self):
+        with translation.override('es'), override_namespaces(['shop']):
+            self.assertEqual(translation.gettext('Checkout'), 'Pagar')
+            django_translation = trans_real._translations['es']
+            self.shop.translation = 'Cesta de compra'
+            self.shop.save()
+            # Only the namespace was reset, the patched object is still in use
+            self.assertIs(trans_real._translations['es'], django_translation)
+            self.assertEqual(translation.gettext('Cart'), 'Cesta de compra')
+
+    def test_moving_row_between_namespaces_invalidates_both(self):
+        with translation.override('es'):
+            with override_namespaces(['shop']):
+                self.assertEqual(translation.gettext('Checkout'), 'Pagar')
+            self.shop.namespace = 'billing'
+            self.shop.save()
+            with override_namespaces(['shop']):
+                self.assertEqual(translation.gettext('Cart'), 'Carrito')
+            with override_namespaces(['billing']):
+                self.assertEqual(translation.gettext('Cart'), 'Cesta')
+
+    def test_snapshot_holds_all_namespaces(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            snapshot = publish_catalog('es')
+        self.assertEqual(snapshot.message_count, 3)
+        with override_settings(DB_TRANSLATIONS_USE_SNAPSHOTS=True):
+            self.assertEqual(dict(db_translation.get_translations_dict('es')), {'Cart': 'Carrito'})
+            self.assertEqual(
+                dict(db_translation.get_translations_dict('es', 'shop')), {'Cart': 'Cesta', 'Checkout': 'Pagar'}
+            )
+
+
+class CatalogResilienceTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        db_translation.reset_translation_cache()
+        self.es = Language.objects.create(code='es', name='Spanish', is_active=True)
+        Translation.objects.create(language=self.es, message_id='Hello world', translation='Hola mundo')
+        self.fallback_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.fallback_dir, ignore_errors=True)
+
+    def tearDown(self):
+        db_translation._degraded.clear()
+
+    def test_last_known_good_file_is_used_when_database_is_down(self):
+        with override_settings(DB_TRANSLATIONS_FALLBACK_DIR=self.fallback_dir):
+            self.assertEqual(db_translation.get_translations_dict('es'), {'Hello world': 'Hola mundo'})
+            self.assertTrue(os.path.exists(os.path.join(self.fallback_dir, 'es.catalog')))
+
+            cache.clear()
+            with mock.patch.object(db_translation, 'fetch_translations_from_db', side_effect=OperationalError):
+                self.assertEqual(db_translation.get_translations_dict('es'), {'Hello world': 'Hola mundo'})
+            self.assertIn('es', db_translation._degraded)
+
+            with override_settings(DB_TRANSLATIONS_RETRY_INTERVAL=0):
+                self.assertEqual(db_translation.retry_degraded_catalogs(), {'es'})
+
+    def test_concurrent_retries_drop_each_language_once(self):
+        db_translation._degraded.update(es=0, fr=0)
+        drop_translation = db_translation._drop_translation
+        retried = []
+
+        def drop_and_retry(lang_code):
+            # Another request retries the same languages in the meantime
+            if not retried:
+                retried.append(db_translation.retry_degraded_catalogs())
+            drop_translation(lang_code)
+
+        with override_settings(DB_TRANSLATIONS_RETRY_INTERVAL=0), \
+                mock.patch.object(db_translation, '_drop_translation', side_effect=drop_and_retry):
+            expired = db_translation.retry_degraded_catalogs()
+        self.assertEqual(expired | retried[0], {'es', 'fr'})
+        self.assertEqual(expired & retried[0], set())
+        self.assertEqual(db_translation._degraded, {})
+
+    def test_database_errors_propagate_without_fallback_dir(self):
+        with mock.patch.object(db_translation, 'fetch_translations_from_db', side_effect=OperationalError):
+            with self.assertRaises(OperationalError):
+                db_translation.get_translations_dict('es')
+
+
+    def test_mysql_replica_lag(self):
+        def mysql_connection(status, new_statement=True):
+            cursor = mock.MagicMock()
+            cursor.description = [(column,) for column in status]
+            cursor.fetchone.return_value = tuple(status.values())
+            if not new_statement:
+                cursor.execute.side_effect = [OperationalError, None]
+            connection = mock.MagicMock(vendor='mysql')
+            connection.cursor.return_value.__enter__.return_value = cursor
+            return {'replica': connection}, cursor
+
+        connections, cursor = mysql_connection({'Seconds_Behind_Source': 3})
+        with mock.patch('db_translations.routing.connections', connections):
+            self.assertEqual(get_replica_lag('replica'), 3.0)
+        cursor.execute.assert_called_once_with('SHOW REPLICA STATUS')
+
+        # MySQL before 8.0.22 only knows the old statement and column
+        connections, cursor = mysql_connection({'Seconds_Behind_Master': 5}, new_statement=False)
+        with mock.patch('db_translations.routing.connections', connections):
+            self.assertEqual(get_replica_lag('replica'), 5.0)
+        self.assertEqual(cursor.execute.call_args_list, [mock.call('SHOW REPLICA STATUS'), mock.call('SHOW SLAVE STATUS')])
+
+
+class AsyncTranslationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        db_translation.reset_translation_cache()
+        self.es = Language.objects.create(code='es', name='Spanish', is_active=True)
+        Translation.objects.create(language=self.es, message_id='Hello world', translation='Hola mundo')
+        activate_db_translation()
+
+    async def test_concurrent_loads_are_coalesced(self):
+        original = db_translation.get_translations_dict
+        with mock.patch.object(db_translation, 'get_translations_dict', side_effect=original) as load:
+            results = await asyncio.gather(*(db_translation.aget_translations_dict('es') for _ in range(5)))
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(results[0], {'Hello world': 'Hola mundo'})
+
+    async def test_async_middleware_loads_active_catalog(self):
+        async def get_response(request):
+            # The catalog is ready before the view runs, so activating the
+            # language no longer touches the database
+            self.assertTrue(db_translation.is_loaded('es'))
+            with translation.override('es'):
+                return translation.gettext('Hello world')
+
+        middleware = DatabaseTranslationMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        self.assertFalse(db_translation.is_loaded('es'))
+        request = RequestFactory().get('/', HTTP_ACCEPT_LANGUAGE='es')
+        self.assertEqual(await middleware(request), 'Hola mundo')
+
+    async def test_async_middleware_loads_tenant_overlay(self):
+        await Translation.objects.acreate(
+            language=self.es, message_id='Hello world', translation='Hola, amigo', tenant='brand-a'
+        )
+
+        async def get_response(request):
+            with translation.override('es'):
+                return translation.gettext('Hello world')
+
+        with override_settings(DB_TRANSLATIONS_TENANT_RESOLVER=lambda request: 'brand-a'):
+            middleware = DatabaseTranslationMiddleware(get_response)
+        request = RequestFactory().get('/', HTTP_ACCEPT_LANGUAGE='es')
+        self.assertEqual(await middleware(request), 'Hola, amigo')
+
+    async def test_async_middleware_loads_view_namespaces(self):
+        await Translation.objects.acreate(language=self.es, message_id='Checkout', translation='Pagar', namespace='shop')
+
+        async def view(request):
+            with translation.override('es'):
+                return translation.gettext('Checkout')
+
+        async def get_response(request):
+            # As Django's handler does once the URL is resolved
+            with translation.override('es'):
+                await middleware.process_view(request, view, (), {})
+            return await view(request)
+
+        with override_settings(DB_TRANSLATIONS_NAMESPACE_RESOLVER=lambda request: ['shop']):
+            middleware = DatabaseTranslationMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware.process_view))
+        request = RequestFactory().get('/', HTTP_ACCEPT_LANGUAGE='es')
+        self.assertEqual(await middleware(request), 'Pagar')
+
+    async def test_prepare_loads_namespaces(self):
+        await Translation.objects.acreate(language=self.es, message_id='Checkout', translation='Pagar', namespace='shop')
+        with override_namespaces(['shop']):
+            await db_translation.aprepare(['es', translation.get_language()])
+            with translation.override('es'):
+                self.assertEqual(translation.gettext('Checkout'), 'Pagar')
+
+    def test_active_object_survives_reset(self):
+        with translation.override('es'):
+            translation.gettext('Hello world')
+            # Another context resets the catalogs while this one is active
+            db_translation.reset_translation_cache()
+            self.assertEqual(translation.gettext('Missing'), 'Missing')
+            self.assertEqual(translation.pgettext('menu', 'Missing'), 'Missing')
+
+    async def test_prewarm(self):
+        await db_translation.aprewarm()
+        self.assertTrue(db_translation.is_loaded('es'))
+
+
+class TranslationMemoryTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        translation_memory.clear()
+        self.es = Language.objects.create(code='es', name='Spanish', is_active=True)
+        Translation.objects.create(language=self.es, message_id='Save changes', translation='Guardar cambios')
+        Translation.objects.create(language=self.es, message_id='Delete account', translation='Eliminar cuenta')
+        self.untranslated = Translation.objects.create(language=self.es, message_id='Save all changes')
+
+    def tearDown(self):
+        translation_memory.clear()
+
+    def test_suggestions_are_ranked_by_similarity(self):
+        memory = TranslationMemory()
+        memory.add(1, 'Save changes', '', 'Guardar cambios')
+        memory.add(2, 'Save', '', 'Guardar')
+        memory.add(3, 'Delete account', '', 'Eliminar cuenta')
+
+        suggestions = memory.suggest('Save changes', min_score=0.3)
+        self.assertEqual([s.pk for s in suggestions], [1, 2])
+        self.assertEqual(suggestions[0].score, 1.0)
+
+        memory.remove(1)
+        self.assertEqual([s.pk for s in memory.suggest('Save changes', min_score=0.3)], [2])
+
+    def test_memory_follows_translation_signals(self):
+        self.assertEqual(translation_memory.suggest('es', 'Remove account')[0].translation, 'Eliminar cuenta')
+
+        self.untranslated.translation = 'Guardar todos los cambios'
+        self.untranslated.save()
+        best = translation_memory.suggest('es', 'Save all changes')[0]
+        self.assertEqual((best.score, best.translation), (1.0, 'Guardar todos los cambios'))
+
+        self.untranslated.delete()
+        self.assertNotEqual(translation_memory.suggest('es', 'Save all changes')[0].score, 1.0)
+
+    def test_changes_from_other_processes_are_picked_up(self):
+        self.assertEqual(translation_memory.suggest('es', 'Save all changes')[0].score, 0.8)
+
+        # A bulk write, as another process or pretranslate would make it
+        Translation.objects.filter(pk=self.untranslated.pk).update(
+            translation='Guardar todos los cambios', updated_at=timezone.now()
+        )
+        self.assertEqual(translation_memory.suggest('es', 'Save all changes')[0].score, 0.8)
+        translation_memory.touch('es')
+        best = translation_memory.suggest('es', 'Save all changes')[0]
+        self.assertEqual((best.score, best.translation), (1.0, 'Guardar todos los cambios'))
+
+    def test_admin_never_builds_memory_in_request(self):
+        model_admin = TranslationAdmin(Translation, admin.site)
+        with mock.patch.object(translation_memory, 'prewarm') as prewarm:
+            self.assertIn('being built', str(model_admin.suggestions(self.untranslated)))
+        prewarm.assert_called_once_with(['es'])
+
+        translation_memory.get('es')
+        self.assertIn('Guardar cambios', model_admin.suggestions(self.untranslated))
+
+    def test_prefill_marks_matches_fuzzy(self):
+        # Matched in this process, then in spawned worker processes
+        for workers in (1, 2):
+            Translation.objects.filter(pk=self.untranslated.pk).update(translation='', fuzzy=False)
+            call_command('prefill_translations', locale=['es'], min_score=0.7, workers=workers, stdout=StringIO())
+            self.untranslated.refresh_from_db()
+            self.assertEqual(self.untranslated.translation, 'Guardar cambios')
+            self.assertTrue(self.untranslated.fuzzy)
+
+        # Fuzzy translations are not served
+        self.assertNotIn('Save all changes', db_translation.fetch_translations_from_db('es'))
+
+    def test_prefill_rejects_invalid_options(self):
+        for option in ('workers', 'batch_size'):
+            with self.assertRaises(CommandError):
+                call_command('prefill_translations', locale=['es'], stdout=StringIO(), **{option: 0})
+
+    def test_prefill_never_overwrites_concurrent_edits(self):
+        other = Translation.objects.create(language=self.es, message_id='Delete all accounts')
+        rows = next(iter_untranslated_chunks(self.es))
+        self.assertEqual([row[0] for row in rows], [self.untranslated.pk, other.pk])
+
+        # A translator saves one of the rows while the batch is being matched
+        self.untranslated.translation = 'Guardar todos los cambios'
+        self.untranslated.save()
+        written = save_translations([(row[0], 'Sugerencia') for row in rows], fuzzy=True)
+
+        self.assertEqual(written, 1)
+        self.untranslated.refresh_from_db()
+        self.assertEqual((self.untranslated.translation, self.untranslated.fuzzy), ('Guardar todos los cambios', False))
+        other.refresh_from_db()
+        self.assertEqual((other.translation, other.fuzzy), ('Sugerencia', True))
+
+
+class TemplateCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        db_translation.reset_translation_cache()
+        self.es = Language.objects.create(code='es', name='Spanish', is_active=True)
+        self.hello = Translation.objects.create(language=self.es, message_id='Hello world', translation='Hola mundo')
+        Translation.objects.create(language=self.es, message_id='Welcome %(name)s', translation='Bienvenido %(name)s')
+        activate_db_translation()
+
+    def render(self, template, **context):
+        with translation.override('es'):
+            return template.render(Context(context))
+
+    def test_translate_is_cached_per_catalog_version(self):
+        template = Template('{% load db_i18n %}{% translate "Hello world" %}')
+        self.assertEqual(self.render(template), 'Hola mundo')
+        self.assertEqual(self.render(template), 'Hola mundo')
+        self.assertEqual(len(template.nodelist[-1]._rendered), 1)
+
+        # Editing the catalog invalidates the cached output
+        self.hello.translation = 'Hola a todos'
+        self.hello.save()
+        self.assertEqual(self.render(template), 'Hola a todos')
+
+    def test_blocktranslate_caches_format_string(self):
+        template = Template('{% load db_i18n %}{% blocktranslate %}Welcome {{ name }}{% endblocktranslate %}')
+        self.assertEqual(self.render(template, name='Ana'), 'Bienvenido Ana')
+        self.assertEqual(self.render(template, name='<b>'), 'Bienvenido &lt;b&gt;')
+        self.assertEqual(list(template.nodelist[-1]._translated.values()), ['Bienvenido %(name)s'])
+
+    def test_tenant_overrides_bypass_cache(self):
+        Translation.objects.create(language=self.es, message_id='Hello world', translation='Hola, amigo', tenant='brand-a')
+        template = Template('{% load db_i18n %}{% translate "Hello world" %}')
+        self.assertEqual(self.render(template), 'Hola mundo')
+        with override_tenant('brand-a'):
+            self.assertEqual(self.render(template), 'Hola, amigo')
+
+    def test_namespaces_are_part_of_cache_key(self):
+        Translation.objects.create(language=self.es, message_id='Hello world', translation='Hola, cliente', namespace='shop')
+        for source in (
+            '{% load db_i18n %}{% translate "Hello world" %}',
+            '{% load db_i18n %}{% blocktranslate %}Hello world{% endblocktranslate %}',
+        ):
+            template = Template(source)
+            with override_namespaces(['shop']):
+                self.assertEqual(self.render(template), 'Hola, cliente')
+            self.assertEqual(self.render(template), 'Hola mundo')
+            with override_namespaces(['shop']):
+                self.assertEqual(self.render(template), 'Hola, cliente')
+
+
+class SharedKeyStorageTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        db_translation.reset_translation_cache()
+        for code, text in (('es', 'Hola mundo'), ('fr', 'Bonjour le monde')):
+            language = Language.objects.create(code=code, name=code, is_active=True)
+            Translation.objects.create(language=language, message_id='Hello world', translation=text)
+            Translation.objects.create(language=language, message_id='Post', context='verb', translation=text)
+
+    def test_catalogs_share_keys(self):
+        table = KeyTable()
+        es = InternedCatalog({'Hello world': 'Hola mundo', 'Bye': ''}, table=table)
+        fr = InternedCatalog({'Hello world': 'Bonjour le monde'}, table=table)
+        self.assertEqual(len(table), 2)
+        self.assertEqual(es.get('Hello world'), 'Hola mundo')
+        self.assertEqual(es.get('Bye', 'x'), '')
+        self.assertEqual(fr.get('Bye', 'x'), 'x')
+        self.assertEqual(dict(fr), {'Hello world': 'Bonjour le monde'})
+
+    @override_settings(DB_TRANSLATIONS_SHARED_KEYS=True)
+    def test_cached_catalogs_are_loaded_into_key_table(self):
+        es = db_translation.get_translations_dict('es')
+        self.assertIsInstance(es, InternedCatalog)
+        self.assertEqual(es, {'Hello world': 'Hola mundo', 'verb\x04Post': 'Hola mundo'})
+        db_translation.get_translations_dict('fr')
+
+        # Loading from the cache resolves the shared key list once
+        db_translation._key_ids.clear()
+        with self.assertNumQueries(0):
+            es = db_translation.get_translations_dict('es')
+            db_translation.get_translations_dict('fr')
+        self.assertEqual(len(db_translation._key_ids), 1)
+        self.assertEqual(es.get('verb\x04Post'), 'Hola mundo')
+
+    def test_small_catalogs_stay_small(self):
+        table = KeyTable()
+        InternedCatalog({f"Message {i}": f"Mensaje {i}" for i in range(1000)}, table=table)
+        namespace = InternedCatalog({'Checkout': 'Pagar', 'Cart': 'Cesta'}, table=table)
+        # Storage grows with the catalog, not with the ids its keys got
+        self.assertEqual((len(namespace._ids), len(namespace._values)), (2, 2))
+        self.assertEqual(namespace['Cart'], 'Cesta')
+        self.assertNotIn('Message 1', namespace)
+
+    @override_settings(DB_TRANSLATIONS_SHARED_KEYS=True, DB_TRANSLATIONS_USE_SNAPSHOTS=True)
+    def test_snapshots_reuse_known_key_lists(self):
+        db_translation.get_translations_dict('fr')
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_catalog('es')
+        with mock.patch.object(db_translation, '_get_snapshot_keys') as get_snapshot_keys:
+            es = db_translation.get_translations_dict('es')
+        # The snapshot has the same key list as the live French catalog
+        get_snapshot_keys.assert_not_called()
+        self.assertEqual(es, {'Hello world': 'Hola mundo', 'verb\x04Post': 'Hola mundo'})
+
+    @override_settings(DB_TRANSLATIONS_USE_SNAPSHOTS=True)
+    def test_snapshots_without_separate_keys_still_load(self):
+        language = Language.objects.get(code='es')
+        snapshot = CatalogSnapshot.objects.create(
+            language=language, version=1, data=dump_catalog({'Hello world': 'Hola'}), message_count=1
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            rollback_catalog('es', version=snapshot.version)
+        self.assertEqual(db_translation.get_translations_dict('es'), {'Hello world': 'Hola'})
+
+    def test_memory_report(self):
+        out = StringIO()
+        call_command('catalog_memory_report', stdout=out)
+        self.assertIn('Key table', out.getvalue())
+        self.assertIn('saved', out.getvalue())
+
+
+class PruneTranslationsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        db_translation.reset_translation_cache()
+        self.es = Language.objects.create(code='es', name='Spanish', is_active=True)
+        Translation.objects.create(language=self.es, message_id='Hello world', translation='Hola mundo')
+        Translation.objects.create(language=self.es, message_id='Old string', translation='Viejo')
+        Translation.objects.create(language=self.es, message_id='Old string', translation='Viejo', tenant='brand-a')
+        activate_db_translation()
+
+    def extract(self, messages, run_id):
+        path = create_temp_po_file([{'msgid': message} for message in messages])
+        self.addCleanup(os.unlink, path)
+        extract_messages_from_po_file(path, 'es', run_id=run_id)
+
+    def test_extraction_stamps_seen_rows(self):
+        self.extract(['Hello world'], '20260101000000000000')
+        self.assertEqual(
+            Translation.objects.get(message_id='Hello world').last_seen_run, '20260101000000000000'
+        )
+        self.assertEqual(list(unseen_translations(self.es).values_list('message_id', 'tenant')), [('Old string', '')])
+
+    def test_prune_deletes_unseen_rows_once_per_language(self):
+        self.extract(['Hello world'], '20260101000000000000')
+        with translation.override('es'):
+            self.assertEqual(translation.gettext('Old string'), 'Viejo')
+
+        archive = os.path.join(tempfile.mkdtemp(), 'pruned.jsonl')
+        self.addCleanup(shutil.rmtree, os.path.dirname(archive))
+        with self.assertRaises(CommandError):
+            call_command('prune_translations', locale=['es'], batch_size=0, stdout=StringIO())
+        out = StringIO()
+        call_command('prune_translations', locale=['es'], dry_run=True, stdout=out)
+        self.assertIn('Would prune 1 strings', out.getvalue())
+        self.assertTrue(Translation.objects.filter(message_id='Old string', tenant='').exists())
+
+        with mock.patch.object(db_translation, 'invalidate_catalog') as invalidate_catalog:
+            call_command('prune_translations', locale=['es'], archive=archive, stdout=StringIO())
+        invalidate_catalog.assert_called_once_with('es')
+        self.assertFalse(Translation.objects.filter(message_id='Old string', tenant='').exists())
+        # Tenant overrides aren't extracted, so they're never pruned
+        self.assertTrue(Translation.objects.filter(message_id='Old string', tenant='brand-a').exists())
+        with open(archive, encoding='utf-8') as f:
+            self.assertIn('"message_id": "Old string"', f.read())
+
+    def test_bulk_delete_refuses_related_rows(self):
+        relation = mock.Mock(auto_created=True, concrete=False, many_to_many=False)
+        relation.name = 'reviews'
+        with mock.patch.object(Translation._meta, 'get_fields', return_value=[relation]):
+            with self.assertRaisesMessage(ValueError, 'reviews'):
+                delete_rows([1])
+
+    def test_never_extracted_namespaces_are_kept(self):
+        self.assertEqual(prune_language(self.es), 0)
+        self.assertEqual(Translation.objects.filter(tenant='').count(), 2)
+
+
+@override_settings(DB_TRANSLATIONS_MERGE_FILE_CATALOGS=True)
+class MergedFileCatalogTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        db_translation.reset_translation_cache()
+        self.es = Language.objects.create(code='es', name='Spanish', is_active=True)
+        Translation.objects.create(language=self.es, message_id='Hello world', translation='Hola mundo')
+        Translation.objects.create(language=self.es, message_id='Delete', translation='Suprimir')
+        Translation.objects.create(language=self.es, message_id='Save', translation='')
+        activate_db_translation()
+
+    def test_file_strings_are_served_without_fallback(self):
+        with translation.override('es'):
+            translation.gettext('Hello world')
+            originals = db_translation._original_django_translations['es']
+            with mock.patch.dict(originals, ugettext=mock.Mock(side_effect=AssertionError)):
+                self.assertEqual(translation.gettext('Hello world'), 'Hola mundo')
+                self.assertEqual(translation.gettext('This field is required.'), 'Este campo es obligatorio.')
+
+    def test_database_takes_precedence_over_files(self):
+        with translation.override('es'):
+            self.assertEqual(translation.gettext('Delete'), 'Suprimir')
+            # Untranslated rows don't hide the file translation
+            self.assertEqual(translation.gettext('Save'), 'Guardar')
+
+    def test_merged_strings_stay_out_of_the_shared_cache(self):
+        with translation.override('es'):
+            translation.gettext('Hello world')
+        self.assertNotIn('This field is required.', db_translation.get_translations_dict('es'))
+        self.assertIn('This field is required.', trans_real._translations['es']._db_catalog)
+
+
+class BatchLookupTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        db_translation.reset_translation_cache()
+        self.es = Language.objects.create(code='es', name='Spanish', is_active=True)
+        Translation.objects.create(language=self.es, message_id='Hello world', translation='Hola mundo')
+        Translation.objects.create(language=self.es, message_id='Open', translation='Abierto', context='status')
+        Translation.objects.create(language=self.es, message_id='Cart', translation='Carrito')
+        Translation.objects.create(language=self.es, message_id='Cart', translation='Cesta', namespace='shop')
+        Translation.objects.create(language=self.es, message_id='Cart', translation='Bolsa', tenant='brand-a')
+        activate_db_translation()
+
+    def test_batch_matches_gettext(self):
+        messages = ['Hello world', 'Cart', 'This field is required.', 'Missing', '']
+        with translation.override('es'):
+            self.assertEqual(gettext_many(messages), [translation.gettext(message) for message in messages])
+            self.assertEqual(
+                pgettext_many('status', ['Open', 'Closed']),
+                [translation.pgettext('status', 'Open'), 'Closed'],
+            )
+        self.assertEqual(gettext_many(['Hello world'], language='es'), ['Hola mundo'])
+        self.assertIsInstance(gettext_many([mark_safe('Hello world')], language='es')[0], SafeData)
+
+    def test_translator_is_bound_to_tenant_and_namespaces(self):
+        with translation.override('es'):
+            self.assertEqual(get_translator()('Cart'), 'Carrito')
+            with override_namespaces(['shop']):
+                translator = get_translator()
+                with override_tenant('brand-a'):
+                    self.assertEqual(get_translator().gettext_many(['Cart', 'Hello world']), ['Bolsa', 'Hola mundo'])
+            self.assertEqual(translator.gettext('Cart'), 'Cesta')
+
+
+class FlakyProvider(TranslationProvider):
+    batch_size = 2
+
+    def __init__(self, failures=1, **options):
+        super().__init__(**options)
+        self.failures = failures
+        self.calls = 0
+
+    def translate(self, messages, source_language, target_language):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ProviderError('Try again')
+        return [message_id.upper() for message_id, context in messages]
+
+
+class PretranslateTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        db_translation.reset_translation_cache()
+        self.fr = Language.objects.create(code='fr', name='French', is_active=True)
+        Translation.objects.create(language=self.fr, message_id='Done', translation='Fait')
+        for message_id in ('Open', 'Closed', 'Pending', 'Archived', 'Draft'):
+            Translation.objects.create(language=self.fr, message_id=message_id, translation='')
+        activate_db_translation()
+
+    def test_stub_provider_fills_untranslated_rows_as_fuzzy(self):
+        out = StringIO()
+        with mock.patch.object(db_translation, 'invalidate_catalog') as invalidate_catalog:
+            call_command('pretranslate', locale=['fr'], batch_size=2, workers=2, stdout=out)
+        self.assertIn('Translated 5 strings', out.getvalue())
+        invalidate_catalog.assert_called_once_with('fr')
+        row = Translation.objects.get(message_id='Open')
+        self.assertEqual(row.translation, '[fr] Open')
+        self.assertTrue(row.fuzzy)
+        self.assertEqual(Translation.objects.get(message_id='Done').translation, 'Fait')
+
+    def test_failed_batches_are_retried(self):
+        provider = FlakyProvider(failures=2)
+        with mock.patch('db_translations.pretranslation.time.sleep'):
+            translated, failed = pretranslate_language(self.fr, provider, workers=1, retries=2, fuzzy=False)
+        self.assertEqual((translated, failed), (5, 0))
+        self.assertEqual(Translation.objects.get(message_id='Draft').translation, 'DRAFT')
+        self.assertFalse(Translation.objects.filter(fuzzy=True).exists())
+
+    def test_wrong_result_counts_and_errors_fail_the_batch(self):
+        class BrokenProvider(TranslationProvider):
+            batch_size = 2
+            calls = 0
+
+            def translate(self, messages, source_language, target_language):
+                self.calls += 1
+                if self.calls == 1:
+                    return ['Un']
+                if self.calls == 2:
+                    raise RuntimeError('Unexpected response')
+                return [message_id.upper() for message_id, context in messages]
+
+        translated, failed = pretranslate_language(self.fr, BrokenProvider(), workers=1)
+        self.assertEqual((translated, failed), (1, 2))
+        self.assertEqual(Translation.objects.filter(translation='').count(), 4)
+
+    def test_catalog_is_invalidated_when_a_write_fails(self):
+        save_translations = mock.Mock(side_effect=[1, OperationalError])
+        with mock.patch('db_translations.pretranslation.save_translations', save_translations), \
+                mock.patch.object(db_translation, 'invalidate_catalog') as invalidate_catalog:
+            with self.assertRaises(OperationalError):
+                pretranslate_language(self.fr, StubProvider(), batch_size=2, workers=1)
+        invalidate_catalog.assert_called_once_with('fr')
+
+    def test_invalid_options_are_rejected(self):
+        for options in ({'retries': -1}, {'workers': 0}, {'batch_size': 0}, {'rate_limit': 0}):
+            with self.assertRaises(CommandError):
+                call_command('pretranslate', locale=['fr'], stdout=StringIO(), **options)
+        with self.assertRaises(ValueError):
+            pretranslate_language(self.fr, StubProvider(), retries=-1)
+        self.assertEqual(Translation.objects.filter(translation='').count(), 5)
+
+    def test_batches_failing_after_retries_are_skipped(self):
+        provider = FlakyProvider(failures=100)
+        with mock.patch('db_translations.pretranslation.time.sleep'):
+            translated, failed = pretranslate_language(self.fr, provider, workers=1, retries=1)
+        self.assertEqual((translated, failed), (0, 3))
+        self.assertEqual(Translation.objects.filter(translation='').count(), 5)
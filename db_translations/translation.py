@@ -1,10 +1,38 @@
+import asyncio
 import functools
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from asgiref.sync import sync_to_async
 from django.utils.translation import trans_real
 from django.core.cache import cache
-from threading import local
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
 from django.conf import settings
-from .models import Translation, Language
+from .models import CatalogSnapshot, Translation, Language
 from .constants import TRANSLATION_CACHE_KEY_PREFIX
+from .interning import InternedCatalog, key_table, pack_catalog
+from .routing import get_read_alias
+from .serialization import load_catalog, read_catalog_file, write_catalog_file
+
+logger = logging.getLogger(__name__)
+
+# Per-thread and per-coroutine translation state. Context variables are
+# isolated between threads as well as between asyncio tasks.
+_in_translation = ContextVar('db_translations_in_translation', default=False)
+_current_tenant = ContextVar('db_translations_tenant', default=None)
+_current_overlays = ContextVar('db_translations_overlays', default=None)
+_active_namespaces = ContextVar('db_translations_namespaces', default=())
+
+# Number of snapshot versions kept in memory per language, so that a
+# rollback to the previous version doesn't have to re-read it
+SNAPSHOT_VERSIONS_KEPT = 2
+
+# Number of shared key lists whose key ids are remembered
+KEY_LISTS_KEPT = 16
 
 
 class DatabaseTranslation:
@@ -15,119 +43,583 @@ class DatabaseTranslation:
     def __init__(self):
         # The original _DJANGO_TRANSLATION attribute
         self._original_django_translations = {}
-        # Thread-local storage for tracking translation state
-        self._local = local()
+        # Pending async loads, per event loop and language
+        self._inflight = {}
+        # Source of the version numbers stamped on patched translation objects
+        self._catalog_versions = itertools.count(1)
+        # Key ids in the shared key table, per digest of a cached key list
+        self._key_ids = {}
         # Cache timeout (default to 24 hours)
         self.cache_timeout = getattr(settings, 'DB_TRANSLATIONS_CACHE_TIMEOUT', 60 * 60 * 24)
+        # Snapshot catalogs loaded by this process, per language and version id
+        self._snapshot_catalogs = {}
+        # Snapshot version id (or None for live rows) each patched language serves
+        self._loaded_versions = {}
+        # Languages served from a last-known-good file, with the time of the failed load
+        self._degraded = {}
+        # Guards the three dicts above, which every request thread reads and
+        # updates
+        self._lock = threading.Lock()
+
+    @property
+    def snapshots_enabled(self):
+        """Whether languages are served from published snapshots instead of live rows"""
+        return getattr(settings, 'DB_TRANSLATIONS_USE_SNAPSHOTS', False)
+
+    @property
+    def shared_keys_enabled(self):
+        """Whether catalogs store their keys once per process in the shared key table"""
+        return getattr(settings, 'DB_TRANSLATIONS_SHARED_KEYS', False)
+
+    @property
+    def merge_file_catalogs_enabled(self):
+        """Whether the catalogs Django loads from .mo files are merged into the database catalog"""
+        return getattr(settings, 'DB_TRANSLATIONS_MERGE_FILE_CATALOGS', False)
     
-    def get_language_from_db(self, lang_code):
+    def get_language_from_db(self, lang_code, using=None):
         """Get language object from database or return None"""
         try:
-            return Language.objects.get(code=lang_code, is_active=True)
+            return Language.objects.using(using).get(code=lang_code, is_active=True)
         except Language.DoesNotExist:
             return None
     
-    def fetch_translations_from_db(self, lang_code):
-        """Fetch all translations for a specific language from the database"""
-        language = self.get_language_from_db(lang_code)
+    def fetch_translations_from_db(self, lang_code, using=None, namespace=''):
+        """Fetch all translations of a namespace for a specific language from the database"""
+        language = self.get_language_from_db(lang_code, using=using)
         if not language:
             return {}
-            
+
+        return self.build_catalog(language, using=using, namespace=namespace)
+
+    def build_catalog(self, language, using=None, namespace=''):
+        """Build the translations dictionary of a namespace for a language object from its rows"""
+        rows = Translation.objects.using(using).filter(
+            language=language, tenant='', fuzzy=False, namespace=namespace
+        ).values_list('message_id', 'context', 'translation')
+
         translations = {}
-        for trans in Translation.objects.filter(language=language):
-            key = trans.message_id
-            if trans.context:
+        for message_id, context, translated in rows.iterator():
+            key = message_id
+            if context:
                 # Handle context-specific translations
-                key = f"{trans.context}\x04{trans.message_id}"
-            translations[key] = trans.translation
+                key = f"{context}\x04{message_id}"
+            translations[key] = translated
         
         return translations
+
+    def build_namespaced_catalogs(self, language, using=None):
+        """Build the translations dictionaries of all namespaces of a language, keyed by namespace"""
+        rows = Translation.objects.using(using).filter(
+            language=language, tenant='', fuzzy=False
+        ).values_list('namespace', 'message_id', 'context', 'translation')
+
+        catalogs = {}
+        for namespace, message_id, context, translated in rows.iterator():
+            key = f"{context}\x04{message_id}" if context else message_id
+            catalogs.setdefault(namespace, {})[key] = translated
+        return catalogs
+
+    def _read_from_db(self, read):
+        """
+        Call read(alias) with the database alias catalogs are read from. If a
+        replica fails, the read is retried once on the primary.
+        """
+        alias = get_read_alias()
+        try:
+            return read(alias)
+        except DatabaseError as e:
+            if alias == DEFAULT_DB_ALIAS:
+                raise
+            logger.warning("Reading translations from '%s' failed, retrying on primary: %s", alias, e)
+            return read(DEFAULT_DB_ALIAS)
+
+    def _cache_get(self, key):
+        """Get a value from the cache, treating an unreachable cache as a miss"""
+        try:
+            return cache.get(key)
+        except Exception as e:
+            logger.warning("Translation cache unavailable: %s", e)
+            return None
+
+    def _cache_set(self, key, value):
+        """Store a value in the cache, ignoring an unreachable cache"""
+        try:
+            cache.set(key, value, self.cache_timeout)
+        except Exception as e:
+            logger.warning("Translation cache unavailable: %s", e)
+
+    def get_tenant_overlay(self, lang_code, tenant):
+        """
+        Get the dictionary of strings a tenant overrides for a language, using
+        cache. The overlay only holds the overrides, never the base catalog.
+        """
+        cache_key = f"{TRANSLATION_CACHE_KEY_PREFIX}_{lang_code}_tenant_{tenant}"
+        overlay = self._cache_get(cache_key)
+
+        if overlay is None:
+            def read(alias):
+                rows = Translation.objects.using(alias).filter(
+                    language__code=lang_code, language__is_active=True, tenant=tenant, fuzzy=False
+                ).exclude(translation='').values_list('message_id', 'context', 'translation')
+                return {
+                    (f"{context}\x04{message_id}" if context else message_id): translated
+                    for message_id, context, translated in rows
+                }
+
+            try:
+                overlay = self._read_from_db(read)
+            except DatabaseError as e:
+                # Serve the base catalog alone rather than failing the lookup
+                logger.error("Could not load overrides of tenant '%s' for '%s': %s", tenant, lang_code, e)
+                return {}
+            self._cache_set(cache_key, overlay)
+
+        return overlay
+
+    def get_tenant(self):
+        """Get the tenant key lookups are currently resolved for, if any"""
+        return _current_tenant.get()
+
+    def set_tenant(self, tenant):
+        """
+        Set the tenant key for subsequent lookups in this thread or task.
+        Overlays are fetched again after every call, so this is done once per
+        request.
+        """
+        _current_tenant.set(tenant or None)
+        _current_overlays.set({})
+
+    def _get_current_overlay(self, lang_code):
+        """Get the overlay of the current tenant for a language, once per request"""
+        tenant = _current_tenant.get()
+        if not tenant:
+            return None
+
+        overlays = _current_overlays.get()
+        if lang_code not in overlays:
+            overlays[lang_code] = self.get_tenant_overlay(lang_code, tenant)
+        return overlays[lang_code]
+
+    def get_namespaces(self):
+        """Get the namespaces looked up, besides the default one, in this thread or task"""
+        return _active_namespaces.get()
+
+    def set_namespaces(self, namespaces):
+        """
+        Set the namespaces looked up before the default namespace. Their
+        catalogs are loaded the first time a lookup needs them.
+        """
+        _active_namespaces.set(tuple(namespace for namespace in namespaces or () if namespace))
+
+    def reset_tenant_overlay(self, lang_code, tenant):
+        """Reset the cached overlay of a single tenant"""
+        cache.delete(f"{TRANSLATION_CACHE_KEY_PREFIX}_{lang_code}_tenant_{tenant}")
+        overlays = _current_overlays.get()
+        if overlays and self.get_tenant() == tenant:
+            overlays.pop(lang_code, None)
+
+    def get_published_version(self, lang_code):
+        """Get the id of the snapshot currently published for a language, or None"""
+        cache_key = f"{TRANSLATION_CACHE_KEY_PREFIX}_version_{lang_code}"
+        version = self._cache_get(cache_key)
+
+        if version is None:
+            version = self._read_from_db(
+                lambda alias: Language.objects.using(alias).filter(
+                    code=lang_code, is_active=True
+                ).values_list('published_snapshot_id', flat=True).first()
+            )
+            # Store 0 for "nothing published" so the lookup is cached as well
+            version = version or 0
+            self._cache_set(cache_key, version)
+
+        return version or None
+
+    def set_published_version(self, lang_code, version):
+        """Point all workers at a new snapshot version for a language"""
+        cache_key = f"{TRANSLATION_CACHE_KEY_PREFIX}_version_{lang_code}"
+        cache.set(cache_key, version or 0, self.cache_timeout)
+
+    def get_snapshot_catalog(self, lang_code, version):
+        """
+        Get the translations dictionaries of a snapshot, keyed by namespace.
+        Snapshots are immutable, so a version already loaded by this process
+        is never read again.
+        """
+        with self._lock:
+            versions = self._snapshot_catalogs.setdefault(lang_code, OrderedDict())
+            catalogs = versions.get(version)
+            if catalogs is not None:
+                versions.move_to_end(version)
+                return catalogs
+
+        cache_key = f"{TRANSLATION_CACHE_KEY_PREFIX}_snapshot_{version}"
+        data = self._cache_get(cache_key)
+        if data is None:
+            data = bytes(self._read_from_db(
+                lambda alias: CatalogSnapshot.objects.using(alias).values_list('data', flat=True).get(pk=version)
+            ))
+            self._cache_set(cache_key, data)
+
+        catalogs = load_catalog(data)
+        if any(isinstance(value, list) for value in catalogs.values()):
+            catalogs = self._unpack_snapshot(version, catalogs)
+        else:
+            if any(isinstance(value, str) for value in catalogs.values()):
+                # Published before namespaces, the blob is the default catalog
+                catalogs = {'': catalogs}
+            if self.shared_keys_enabled:
+                catalogs = {namespace: InternedCatalog(catalog) for namespace, catalog in catalogs.items()}
+        with self._lock:
+            # A reset may have replaced the dict while the snapshot was read
+            versions = self._snapshot_catalogs.setdefault(lang_code, OrderedDict())
+            versions[version] = catalogs
+            # Drop the least recently used versions beyond the ones kept around
+            # for rollbacks; the requested version is always the most recent
+            while len(versions) > SNAPSHOT_VERSIONS_KEPT:
+                versions.popitem(last=False)
+
+        return catalogs
+
+    def _unpack_snapshot(self, version, packed):
+        """
+        Build the catalogs of a snapshot from the key list digest and values
+        of each namespace. With shared keys, key lists this process already
+        has aren't decoded again; the snapshot's keys are only read for the
+        others.
+        """
+        key_lists = {}
+        if self.shared_keys_enabled:
+            for digest, values in packed.values():
+                key_ids = self._get_key_ids(digest)
+                if key_ids is not None:
+                    key_lists[digest] = key_ids
+
+        missing = {digest for digest, values in packed.values() if digest not in key_lists}
+        if missing:
+            keys = load_catalog(self._get_snapshot_keys(version))
+            for digest in missing:
+                if self.shared_keys_enabled:
+                    key_lists[digest] = self._remember_key_ids(digest, keys[digest])
+                    self._cache_set(f"{TRANSLATION_CACHE_KEY_PREFIX}_keys_{digest}", keys[digest])
+                else:
+                    key_lists[digest] = keys[digest]
+
+        if self.shared_keys_enabled:
+            return {
+                namespace: InternedCatalog.from_key_ids(key_lists[digest], values)
+                for namespace, (digest, values) in packed.items()
+            }
+        return {namespace: dict(zip(key_lists[digest], values)) for namespace, (digest, values) in packed.items()}
+
+    def _get_snapshot_keys(self, version):
+        """Get the compressed key lists of a snapshot"""
+        cache_key = f"{TRANSLATION_CACHE_KEY_PREFIX}_snapshot_{version}_keys"
+        data = self._cache_get(cache_key)
+        if data is None:
+            data = bytes(self._read_from_db(
+                lambda alias: CatalogSnapshot.objects.using(alias).values_list('keys', flat=True).get(pk=version)
+            ))
+            self._cache_set(cache_key, data)
+        return data
+
+    def refresh_published_versions(self):
+        """
+        Drop translation objects of languages whose published snapshot has
+        changed since they were loaded. Returns the refreshed language codes.
+
+        This costs a single cache round trip, so it can run on every request.
+        """
+        if not self.snapshots_enabled:
+            return set()
+        with self._lock:
+            loaded_versions = dict(self._loaded_versions)
+        if not loaded_versions:
+            return set()
+
+        keys = {
+            f"{TRANSLATION_CACHE_KEY_PREFIX}_version_{lang_code}": lang_code
+            for lang_code in loaded_versions
+        }
+        try:
+            cached = cache.get_many(keys)
+        except Exception as e:
+            logger.warning("Translation cache unavailable: %s", e)
+            return set()
+
+        refreshed = set()
+        for cache_key, lang_code in keys.items():
+            if cache_key in cached:
+                version = cached[cache_key] or None
+            else:
+                try:
+                    version = self.get_published_version(lang_code)
+                except DatabaseError:
+                    # Keep serving the loaded version until the database is back
+                    continue
+            if version != loaded_versions[lang_code]:
+                refreshed.add(lang_code)
+
+        for lang_code in refreshed:
+            self._drop_translation(lang_code)
+
+        return refreshed
+
+    def retry_degraded_catalogs(self):
+        """
+        Drop translation objects that were built from a last-known-good file
+        after DB_TRANSLATIONS_RETRY_INTERVAL seconds, so the next lookup tries
+        the cache and database again. Returns the dropped language codes.
+        """
+        if not self._degraded:
+            return set()
+
+        interval = getattr(settings, 'DB_TRANSLATIONS_RETRY_INTERVAL', 30)
+        now = time.monotonic()
+        # Languages are claimed under the lock, so a concurrent request never
+        # retries the same language again
+        with self._lock:
+            expired = {
+                lang_code for lang_code, failed_at in list(self._degraded.items())
+                if now - failed_at >= interval
+            }
+            for lang_code in expired:
+                self._degraded.pop(lang_code, None)
+
+        for lang_code in expired:
+            self._drop_translation(lang_code)
+
+        return expired
+
+    def refresh_catalogs(self):
+        """
+        Pick up catalogs published or rolled back by other processes, and
+        retry catalogs served from a last-known-good file. Returns the
+        language codes whose translation objects were dropped.
+        """
+        return self.refresh_published_versions() | self.retry_degraded_catalogs()
+
+    def _drop_translation(self, lang_code):
+        """Forget the patched translation object of a language in this process"""
+        with self._lock:
+            self._loaded_versions.pop(lang_code, None)
+        self._original_django_translations.pop(lang_code, None)
+        trans_real._translations.pop(lang_code, None)
+
+    def _get_fallback_path(self, lang_code, namespace=''):
+        """Get the path of a catalog's last-known-good file, if those are enabled"""
+        directory = getattr(settings, 'DB_TRANSLATIONS_FALLBACK_DIR', None)
+        if not directory:
+            return None
+        name = f"{lang_code}.{namespace}" if namespace else lang_code
+        return os.path.join(directory, f"{name}.catalog")
+
+    def _get_catalog_cache_key(self, lang_code, namespace=''):
+        """
+        Get the cache key of a catalog. Namespace keys include the language's
+        cache generation, so resetting a language drops all its namespaces.
+        """
+        if not namespace:
+            return f"{TRANSLATION_CACHE_KEY_PREFIX}_{lang_code}"
+        generation = self._cache_get(f"{TRANSLATION_CACHE_KEY_PREFIX}_{lang_code}_generation") or 0
+        return f"{TRANSLATION_CACHE_KEY_PREFIX}_{lang_code}_ns_{namespace}_{generation}"
     
-    def get_translations_dict(self, lang_code):
-        """Get translations dictionary for a language, using cache"""
-        cache_key = f"{TRANSLATION_CACHE_KEY_PREFIX}_{lang_code}"
-        translations = cache.get(cache_key)
+    def get_translations_dict(self, lang_code, namespace=''):
+        """
+        Get translations dictionary of a namespace for a language, using
+        cache. When both the database and the cache are unavailable, the
+        last-known-good file written by an earlier successful load is used
+        instead.
+        """
+        fallback_path = self._get_fallback_path(lang_code, namespace)
+
+        try:
+            translations = self._load_translations_dict(lang_code, namespace)
+        except DatabaseError as e:
+            if fallback_path is None:
+                raise
+            translations = read_catalog_file(fallback_path)
+            with self._lock:
+                self._degraded[lang_code] = time.monotonic()
+            logger.error(
+                "Could not load translations for '%s', serving %s: %s",
+                lang_code, 'last-known-good file' if translations is not None else 'source strings', e
+            )
+            return translations or {}
+
+        if fallback_path is not None:
+            try:
+                write_catalog_file(fallback_path, translations)
+            except OSError as e:
+                logger.warning("Could not write last-known-good translations for '%s': %s", lang_code, e)
+
+        return translations
+
+    def _load_translations_dict(self, lang_code, namespace=''):
+        """Load translations dictionary of a namespace for a language from the cache or database"""
+        if self.snapshots_enabled:
+            version = self.get_published_version(lang_code)
+            if version:
+                # Snapshots hold all namespaces of a language
+                translations = self.get_snapshot_catalog(lang_code, version).get(namespace, {})
+                with self._lock:
+                    self._loaded_versions[lang_code] = version
+                return translations
+            # Nothing published yet, serve the live rows
+            with self._lock:
+                self._loaded_versions[lang_code] = None
+
+        cache_key = self._get_catalog_cache_key(lang_code, namespace)
+        if self.shared_keys_enabled:
+            return self._load_interned_catalog(lang_code, namespace, cache_key)
+
+        translations = self._cache_get(cache_key)
         
         if translations is None:
-            translations = self.fetch_translations_from_db(lang_code)
-            cache.set(cache_key, translations, self.cache_timeout)
+            translations = self._read_from_db(
+                lambda alias: self.fetch_translations_from_db(lang_code, using=alias, namespace=namespace)
+            )
+            self._cache_set(cache_key, translations)
             
         return translations
     
+    def _load_interned_catalog(self, lang_code, namespace, catalog_cache_key):
+        """
+        Load a live catalog on top of the shared key table.
+
+        The cached blob only holds the digest of the catalog's key list and
+        its values. The key list is cached separately under its digest and
+        decoded at most once per process for all languages sharing it.
+        """
+        cache_key = f"{catalog_cache_key}_packed"
+        packed = self._cache_get(cache_key)
+
+        if packed is not None:
+            digest, values = packed
+            key_ids = self._get_key_ids(digest)
+            if key_ids is not None:
+                return InternedCatalog.from_key_ids(key_ids, values)
+
+        translations = self._read_from_db(
+            lambda alias: self.fetch_translations_from_db(lang_code, using=alias, namespace=namespace)
+        )
+        digest, keys, values = pack_catalog(translations)
+        key_ids = self._remember_key_ids(digest, keys)
+        self._cache_set(f"{TRANSLATION_CACHE_KEY_PREFIX}_keys_{digest}", keys)
+        self._cache_set(cache_key, (digest, values))
+        return InternedCatalog.from_key_ids(key_ids, values)
+
+    def _get_key_ids(self, digest):
+        """Get the shared key ids of a cached key list, or None if it isn't cached"""
+        key_ids = self._key_ids.get(digest)
+        if key_ids is None:
+            keys = self._cache_get(f"{TRANSLATION_CACHE_KEY_PREFIX}_keys_{digest}")
+            if keys is None:
+                return None
+            key_ids = self._remember_key_ids(digest, keys)
+        return key_ids
+
+    def _remember_key_ids(self, digest, keys):
+        if len(self._key_ids) >= KEY_LISTS_KEPT:
+            self._key_ids.clear()
+        key_ids = self._key_ids[digest] = [key_table.intern(key) for key in keys]
+        return key_ids
+
     def translation(self, language):
         """
         Returns a translation object for a language.
         This overrides Django's get_translation function to use database translations.
         """
         # Check if we're already in a translation lookup to prevent recursion
-        if getattr(self._local, 'in_translation', False):
+        if _in_translation.get():
             return self._get_original_translation(language)
 
         # Set the translation lookup flag
-        self._local.in_translation = True
+        token = _in_translation.set(True)
         
         # Get the original Django translation object
         try:
             django_translation = self._get_original_translation(language)
         finally:
             # Always clear the translation lookup flag
-            self._local.in_translation = False
+            _in_translation.reset(token)
 
         # If we've already patched this translation object, return it
         if hasattr(django_translation, '_db_patched'):
             return django_translation
             
-        # Store the original _info dict
-        if language not in self._original_django_translations:
-            self._original_django_translations[language] = {
-                'ugettext': django_translation.gettext,
-                'ungettext': django_translation.ngettext,
-                'upgettext': getattr(django_translation, 'pgettext', None),
-                'upngettext': getattr(django_translation, 'npgettext', None),
-            }
+        # Store the original _info dict. The closures below hold on to it, so
+        # an object still active somewhere keeps working after a reset
+        originals = self._original_django_translations.setdefault(language, {
+            'ugettext': django_translation.gettext,
+            'ungettext': django_translation.ngettext,
+            'upgettext': getattr(django_translation, 'pgettext', None),
+            'upngettext': getattr(django_translation, 'npgettext', None),
+        })
         
         # Get translations from database
         translations = self.get_translations_dict(language)
+        if self.merge_file_catalogs_enabled:
+            translations = self.merge_file_catalog(django_translation, translations)
+        # Catalogs of other namespaces, loaded the first time they're looked up
+        namespaces = {}
         
+        def lookup(key):
+            # The current tenant's overrides take precedence over the base catalog
+            overlay = self._get_current_overlay(language)
+            if overlay:
+                result = overlay.get(key)
+                if result:
+                    return result
+            # Then the active namespaces, before the default namespace
+            for namespace in _active_namespaces.get():
+                catalog = namespaces.get(namespace)
+                if catalog is None:
+                    catalog = namespaces[namespace] = self.get_translations_dict(language, namespace)
+                result = catalog.get(key)
+                if result:
+                    return result
+            return translations.get(key, '')
+
         # Replace the gettext functions
         def db_gettext(message):
-            result = translations.get(message, '')
+            result = lookup(message)
             if not result:
                 # Fallback to original Django translation
-                result = self._original_django_translations[language]['ugettext'](message)
+                result = originals['ugettext'](message)
             return result
         
         def db_ngettext(singular, plural, number):
             if number == 1:
-                result = translations.get(singular, '')
+                result = lookup(singular)
                 if not result:
-                    result = self._original_django_translations[language]['ungettext'](singular, plural, 1)
+                    result = originals['ungettext'](singular, plural, 1)
                 return result
             else:
-                result = translations.get(plural, '')
+                result = lookup(plural)
                 if not result:
-                    result = self._original_django_translations[language]['ungettext'](singular, plural, number)
+                    result = originals['ungettext'](singular, plural, number)
                 return result
         
         def db_pgettext(context, message):
             context_message = f"{context}\x04{message}"
-            result = translations.get(context_message, '')
-            if not result and self._original_django_translations[language]['upgettext']:
-                result = self._original_django_translations[language]['upgettext'](context, message)
+            result = lookup(context_message)
+            if not result and originals['upgettext']:
+                result = originals['upgettext'](context, message)
             return result or message
         
         def db_npgettext(context, singular, plural, number):
             if number == 1:
                 context_message = f"{context}\x04{singular}"
-                result = translations.get(context_message, '')
-                if not result and self._original_django_translations[language]['upngettext']:
-                    result = self._original_django_translations[language]['upngettext'](context, singular, plural, 1)
+                result = lookup(context_message)
+                if not result and originals['upngettext']:
+                    result = originals['upngettext'](context, singular, plural, 1)
                 return result or singular
             else:
                 context_message = f"{context}\x04{plural}"
-                result = translations.get(context_message, '')
-                if not result and self._original_django_translations[language]['upngettext']:
-                    result = self._original_django_translations[language]['upngettext'](context, singular, plural, number)
+                result = lookup(context_message)
+                if not result and originals['upngettext']:
+                    result = originals['upngettext'](context, singular, plural, number)
                 return result or plural
         
         # Replace the translation methods
@@ -141,9 +633,156 @@ class DatabaseTranslation:
         
         # Mark this translation object as patched
         django_translation._db_patched = True
+        django_translation._db_catalog = translations
+        django_translation._db_originals = originals
+        django_translation._db_namespaces = namespaces
+        # Every rebuilt catalog gets a new version, for caches keyed on it
+        django_translation._db_catalog_version = next(self._catalog_versions)
         
         return django_translation
 
+    def merge_file_catalog(self, django_translation, translations):
+        """
+        Merge the catalog Django loaded from .mo files, fallback languages
+        included, under a database catalog, so strings of Django and
+        third-party apps are found by the same single lookup. Translated
+        database rows take precedence.
+
+        The result is kept per process only; file catalogs are never written
+        to the shared cache.
+        """
+        merged = {}
+        current = django_translation
+        while current is not None:
+            catalog = getattr(current, '_catalog', None)
+            if catalog is not None:
+                for key, value in catalog.items():
+                    # Plural forms are keyed by (msgid, index) and still go
+                    # through Django; the '' key holds the .mo headers
+                    if isinstance(key, str) and key and value:
+                        merged.setdefault(key, value)
+            current = getattr(current, '_fallback', None)
+
+        merged.update((key, value) for key, value in translations.items() if value)
+        return InternedCatalog(merged) if self.shared_keys_enabled else merged
+
+    def get_catalogs(self, language):
+        """
+        Get the catalogs a lookup in a language consults, in order of
+        precedence for the current tenant and namespaces, and the function
+        strings found in none of them fall back to. Loads the language first
+        if needed.
+        """
+        django_translation = trans_real.translation(language)
+        namespaces = getattr(django_translation, '_db_namespaces', None)
+        if namespaces is None:
+            # Not patched, e.g. before activate_db_translation()
+            return (), django_translation.gettext
+
+        catalogs = []
+        overlay = self._get_current_overlay(language)
+        if overlay:
+            catalogs.append(overlay)
+        for namespace in _active_namespaces.get():
+            catalog = namespaces.get(namespace)
+            if catalog is None:
+                catalog = namespaces[namespace] = self.get_translations_dict(language, namespace)
+            catalogs.append(catalog)
+        catalogs.append(django_translation._db_catalog)
+        return tuple(catalogs), django_translation._db_originals['ugettext']
+
+    def is_loaded(self, language):
+        """Whether a patched translation object for a language is ready in this process"""
+        return hasattr(trans_real._translations.get(language), '_db_patched')
+
+    def get_catalog_version(self, language, key=None):
+        """
+        Get the version of the catalog loaded for a language in this process,
+        which changes whenever the catalog is invalidated, or None if it isn't
+        loaded. With a lookup key, None is also returned when the current
+        tenant overrides that key, since the result then isn't shared.
+        """
+        version = getattr(trans_real._translations.get(language), '_db_catalog_version', None)
+        if version is not None and key is not None:
+            overlay = self._get_current_overlay(language)
+            if overlay and key in overlay:
+                return None
+        return version
+
+    async def _single_flight(self, key, load):
+        """
+        Await load() for a key, sharing a single pending load between all
+        coroutines of the running event loop that ask for the same key.
+        """
+        key = (asyncio.get_running_loop(), key)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(load())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A cancelled caller mustn't cancel the load other callers wait for
+        return await asyncio.shield(task)
+
+    async def aget_translations_dict(self, lang_code, namespace=''):
+        """
+        Async version of get_translations_dict. The load runs in the thread
+        Django uses for database access, so the event loop keeps serving
+        other requests in the meantime.
+        """
+        return await self._single_flight(
+            ('catalog', lang_code, namespace),
+            lambda: sync_to_async(self.get_translations_dict)(lang_code, namespace),
+        )
+
+    async def atranslation(self, language):
+        """
+        Async version of translation(). Once it returns, lookups for the
+        language are served from memory and never block the event loop.
+        """
+        if self.is_loaded(language):
+            return trans_real._translations[language]
+        return await self._single_flight(
+            ('translation', language), lambda: sync_to_async(trans_real.translation)(language)
+        )
+
+    async def aprepare(self, languages):
+        """
+        Load everything lookups in the given languages need in the current
+        context: the translation objects, the current tenant's overlays and
+        the catalogs of the active namespaces. Afterwards, lookups in async
+        code never touch the database or cache.
+        """
+        languages = [language for language in dict.fromkeys(languages) if language]
+        await asyncio.gather(*(
+            self.atranslation(language) for language in languages if not self.is_loaded(language)
+        ))
+
+        tenant = _current_tenant.get()
+        overlays = _current_overlays.get()
+        if tenant and overlays is not None:
+            for language in languages:
+                if language not in overlays:
+                    overlays[language] = await sync_to_async(self.get_tenant_overlay)(language, tenant)
+
+        for language in languages:
+            namespaces = getattr(trans_real._translations.get(language), '_db_namespaces', None)
+            if namespaces is None:
+                continue
+            for namespace in _active_namespaces.get():
+                if namespace not in namespaces:
+                    namespaces[namespace] = await self.aget_translations_dict(language, namespace)
+
+    async def aprewarm(self, languages=None):
+        """
+        Load the translation objects of the given languages, or of all active
+        languages, concurrently and without blocking the event loop.
+        """
+        if languages is None:
+            languages = await sync_to_async(list)(
+                Language.objects.filter(is_active=True).values_list('code', flat=True)
+            )
+        await asyncio.gather(*(self.atranslation(language) for language in languages))
+
     def _get_original_translation(self, language):
         """
         Get the original Django translation object without our override
@@ -151,6 +790,33 @@ class DatabaseTranslation:
         original_translation_func = getattr(trans_real, '_original_translation', trans_real.translation)
         return original_translation_func(language)
 
+    def invalidate_catalog(self, lang_code, namespace=None):
+        """
+        Invalidate a language's base catalog after its rows changed, or only
+        the catalog of one namespace. With snapshot publishing enabled,
+        changes are drafts and nothing is reset.
+        """
+        if self.snapshots_enabled:
+            return
+        if namespace:
+            self.reset_namespace(lang_code, namespace)
+        else:
+            self.reset_translation_cache(lang_code)
+
+    def reset_namespace(self, lang_code, namespace):
+        """
+        Reset the cached catalog of a single namespace, leaving the catalogs
+        of the language's other namespaces loaded
+        """
+        cache_key = self._get_catalog_cache_key(lang_code, namespace)
+        cache.delete_many([cache_key, f"{cache_key}_packed"])
+
+        django_translation = trans_real._translations.get(lang_code)
+        namespaces = getattr(django_translation, '_db_namespaces', None)
+        if namespaces and namespaces.pop(namespace, None) is not None:
+            # Caches keyed on the catalog version must not serve the old strings
+            django_translation._db_catalog_version = next(self._catalog_versions)
+
     def reset_translation_cache(self, lang_code=None):
         """
         Reset both the Redis cache and the in-memory translation objects.
@@ -159,20 +825,46 @@ class DatabaseTranslation:
         if lang_code:
             # Clear specific language cache
             cache_key = f"{TRANSLATION_CACHE_KEY_PREFIX}_{lang_code}"
-            cache.delete(cache_key)
+            cache.delete_many([
+                cache_key,
+                f"{cache_key}_packed",
+                f"{TRANSLATION_CACHE_KEY_PREFIX}_version_{lang_code}",
+            ])
+            self._bump_generation(lang_code)
             # Remove from our original translations dict
-            if lang_code in self._original_django_translations:
-                del self._original_django_translations[lang_code]
+            self._original_django_translations.pop(lang_code, None)
+            with self._lock:
+                self._loaded_versions.pop(lang_code, None)
         else:
             # Clear all language caches
-            cache.delete(TRANSLATION_CACHE_KEY_PREFIX)
+            with self._lock:
+                lang_codes = set(self._loaded_versions)
+            lang_codes |= set(Language.objects.values_list('code', flat=True))
+            cache.delete_many([
+                f"{TRANSLATION_CACHE_KEY_PREFIX}_{lang_code}{suffix}"
+                for lang_code in lang_codes
+                for suffix in ('', '_packed')
+            ] + [
+                f"{TRANSLATION_CACHE_KEY_PREFIX}_version_{lang_code}"
+                for lang_code in lang_codes
+            ])
+            for lang_code in lang_codes:
+                self._bump_generation(lang_code)
             # Clear all our original translations
             self._original_django_translations.clear()
+            with self._lock:
+                self._loaded_versions.clear()
+                self._snapshot_catalogs.clear()
             
         # Clear Django's internal translation cache to force reload
         trans_real._translations.clear()
     
 
+    def _bump_generation(self, lang_code):
+        """Move a language to a new cache generation, orphaning its namespace catalogs"""
+        cache.set(f"{TRANSLATION_CACHE_KEY_PREFIX}_{lang_code}_generation", time.time_ns(), None)
+    
+
 # Create a singleton instance
 db_translation = DatabaseTranslation()
 
@@ -182,6 +874,12 @@ def activate_db_translation():
     Override Django's translation function with our database-backed version.
     This should be called in AppConfig.ready()
     """
+    # Keep a reference to Django's own translation function, which the
+    # engine falls back to. Only store it once so repeated activation
+    # doesn't point it at our own patched function.
+    if not hasattr(trans_real, '_original_translation'):
+        trans_real._original_translation = trans_real.translation
+
     # Monkey patch Django's translation function
     trans_real.translation = db_translation.translation
 
@@ -196,3 +894,5 @@ def clear_translations():
     
     # Clear our db_translation patched objects cache
     db_translation._original_django_translations.clear()
+    with db_translation._lock:
+        db_translation._loaded_versions.clear()
@@ -0,0 +1,329 @@
+import heapq
+import logging
+import math
+import threading
+import time
+from array import array
+from collections import Counter, namedtuple
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+from .constants import TRANSLATION_CACHE_KEY_PREFIX
+from .models import Language, Translation
+from .routing import get_read_alias
+
+logger = logging.getLogger(__name__)
+
+# Length of the character n-grams source strings are indexed by
+NGRAM_SIZE = 3
+
+# Rebuild the posting lists once this share of their entries is stale
+COMPACT_RATIO = 0.5
+
+# Cache key prefix of the markers telling processes their memories are out of date
+MARKER_KEY_PREFIX = f"{TRANSLATION_CACHE_KEY_PREFIX}_memory"
+
+# How far back catching up with changes reaches before the last sync
+SYNC_OVERLAP = timedelta(minutes=1)
+
+Suggestion = namedtuple('Suggestion', ['score', 'message_id', 'context', 'translation', 'pk'])
+
+
+def ngrams(text, size=NGRAM_SIZE):
+    """
+    Return the set of character n-grams of a string. The string is
+    lower-cased and padded, so short strings and word edges still count.
+    """
+    text = f"{' ' * (size - 1)}{text.lower()} "
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class TranslationMemory:
+    """
+    Character n-gram index over the translated strings of one language,
+    used to suggest existing translations for similar source strings.
+
+    Similarity is the Dice coefficient of the n-gram sets. Posting lists are
+    compact integer arrays, and queries count shared n-grams over them
+    without touching entries that can't reach the minimum score.
+    """
+    def __init__(self):
+        # Internal entry id -> (pk, message_id, context, translation, ngram count)
+        self._entries = {}
+        # Translation pk -> internal entry id
+        self._ids = {}
+        # N-gram -> array of internal entry ids
+        self._postings = {}
+        self._next_id = 0
+        self._stale = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, pk, message_id, context, translation):
+        """Add or replace the entry of a translation row"""
+        with self._lock:
+            self._discard(pk)
+            if not translation:
+                return
+
+            grams = ngrams(message_id)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._ids[pk] = entry_id
+            self._entries[entry_id] = (pk, message_id, context, translation, len(grams))
+            for gram in grams:
+                postings = self._postings.get(gram)
+                if postings is None:
+                    postings = self._postings[gram] = array('q')
+                postings.append(entry_id)
+
+    def entries(self):
+        """Return the indexed rows as (pk, message_id, context, translation) tuples"""
+        with self._lock:
+            return [entry[:4] for entry in self._entries.values()]
+
+    def remove(self, pk):
+        """Remove the entry of a translation row, if indexed"""
+        with self._lock:
+            self._discard(pk)
+
+    def _discard(self, pk):
+        entry_id = self._ids.pop(pk, None)
+        if entry_id is None:
+            return
+
+        # Posting lists keep the stale id until the next compaction
+        del self._entries[entry_id]
+        self._stale += 1
+        if self._stale > len(self._entries) * COMPACT_RATIO:
+            self._compact()
+
+    def _compact(self):
+        """Rebuild the posting lists from the live entries"""
+        postings = {}
+        for entry_id in sorted(self._entries):
+            for gram in ngrams(self._entries[entry_id][1]):
+                postings.setdefault(gram, array('q')).append(entry_id)
+        self._postings = postings
+        self._stale = 0
+
+    def suggest(self, text, limit=5, min_score=0.5, exclude_pk=None):
+        """
+        Return up to `limit` suggestions for a source string, best first,
+        with a similarity score between min_score and 1.
+        """
+        grams = ngrams(text)
+        if not grams or not self._entries:
+            return []
+
+        # Any entry scoring at least min_score shares at least min_overlap
+        # n-grams with the query; counting is done by Counter in C
+        min_score = min(max(min_score, 0.01), 1.0)
+        min_overlap = max(1, math.ceil(min_score * len(grams) / (2 - min_score)))
+        counts = Counter()
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings is not None:
+                counts.update(postings)
+
+        scored = []
+        for entry_id, overlap in counts.items():
+            if overlap < min_overlap:
+                continue
+            entry = self._entries.get(entry_id)
+            if entry is None or entry[0] == exclude_pk:
+                continue
+            score = 2 * overlap / (len(grams) + entry[4])
+            if score >= min_score:
+                scored.append((score, entry_id))
+
+        return [
+            Suggestion(round(score, 4), *self._entries[entry_id][1:4], self._entries[entry_id][0])
+            for score, entry_id in heapq.nlargest(limit, scored)
+        ]
+
+
+class TranslationMemoryRegistry:
+    """
+    Translation memories per language, built from the database and kept up
+    to date with changes made by any process.
+
+    Writers mark a language as changed (touch) or reset through the cache.
+    A process notices a changed marker on the next lookup and indexes the
+    rows updated since it last synced; a reset marker, set when rows are
+    deleted, has the memory rebuilt.
+    """
+    def __init__(self):
+        self._memories = {}
+        # Language code -> (changed marker, reset marker, synced at)
+        self._synced = {}
+        self._building = set()
+        self._lock = threading.Lock()
+
+    def _get_markers(self, lang_code):
+        keys = [f"{MARKER_KEY_PREFIX}_changed_{lang_code}", f"{MARKER_KEY_PREFIX}_reset_{lang_code}"]
+        try:
+            markers = cache.get_many(keys)
+        except Exception:
+            logger.warning("Could not read translation memory markers for '%s'", lang_code, exc_info=True)
+            markers = {}
+        return markers.get(keys[0]), markers.get(keys[1])
+
+    def _set_marker(self, kind, lang_code):
+        try:
+            cache.set(f"{MARKER_KEY_PREFIX}_{kind}_{lang_code}", time.time_ns(), None)
+        except Exception:
+            logger.warning("Could not mark the translation memory of '%s' as %s", lang_code, kind, exc_info=True)
+
+    def touch(self, lang_code):
+        """Tell all processes that translations of a language were added or changed"""
+        self._set_marker('changed', lang_code)
+
+    def reset(self, lang_code):
+        """Tell all processes to rebuild the memory of a language, e.g. after rows were deleted"""
+        self._set_marker('reset', lang_code)
+
+    def get(self, lang_code):
+        """
+        Get the memory of a language, building it or catching up with
+        changes in the calling thread if needed
+        """
+        changed, reset = self._get_markers(lang_code)
+        memory = self._memories.get(lang_code)
+        if memory is None or self._synced[lang_code][1] != reset:
+            return self._build(lang_code, changed, reset)
+        if self._synced[lang_code][0] != changed:
+            self._catch_up(lang_code, memory, changed, reset)
+        return memory
+
+    def get_ready(self, lang_code):
+        """
+        Get the memory of a language without building it in the calling
+        thread, e.g. during a request. A missing or reset memory is built in
+        the background; meanwhile the previous memory, or None, is returned.
+        """
+        changed, reset = self._get_markers(lang_code)
+        memory = self._memories.get(lang_code)
+        if memory is None or self._synced[lang_code][1] != reset:
+            self.prewarm([lang_code])
+            return memory
+        if self._synced[lang_code][0] != changed:
+            self._catch_up(lang_code, memory, changed, reset)
+        return memory
+
+    def prewarm(self, languages=None):
+        """
+        Build the memories of the given languages, or of all active
+        languages, in a background thread. Returns the thread, or None when
+        all of them are already being built.
+        """
+        if languages is not None:
+            languages = self._claim(languages)
+            if not languages:
+                return None
+
+        thread = threading.Thread(
+            target=self._build_in_background, args=(languages,), name='translation-memory-build', daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _claim(self, languages):
+        """Mark languages as being built, returning those that weren't already"""
+        with self._lock:
+            pending = [lang_code for lang_code in languages if lang_code not in self._building]
+            self._building.update(pending)
+        return pending
+
+    def _build_in_background(self, languages):
+        try:
+            if languages is None:
+                # Queried here, so starting a worker never waits on the database
+                languages = self._claim(Language.objects.filter(is_active=True).values_list('code', flat=True))
+            for lang_code in languages:
+                try:
+                    self._build(lang_code, *self._get_markers(lang_code))
+                except Exception:
+                    logger.exception("Could not build the translation memory of '%s'", lang_code)
+                finally:
+                    with self._lock:
+                        self._building.discard(lang_code)
+        finally:
+            # Connections are per thread, and this one is done with them
+            connections.close_all()
+
+    def _build(self, lang_code, changed, reset):
+        started = timezone.now()
+        memory = self.build(lang_code)
+        with self._lock:
+            self._memories[lang_code] = memory
+            self._synced[lang_code] = (changed, reset, started)
+        return memory
+
+    def build(self, lang_code):
+        """Build the memory of a language from its reviewed translations"""
+        memory = TranslationMemory()
+        rows = Translation.objects.using(get_read_alias()).filter(
+            language__code=lang_code, tenant='', fuzzy=False
+        ).exclude(translation='').values_list('pk', 'message_id', 'context', 'translation')
+
+        for pk, message_id, context, translated in rows.iterator(chunk_size=2000):
+            memory.add(pk, message_id, context, translated)
+        return memory
+
+    def _catch_up(self, lang_code, memory, changed, reset):
+        """Index the rows of a language updated since the memory was last synced"""
+        started = timezone.now()
+        # Rows saved in transactions that committed after the last sync may
+        # carry an earlier timestamp; indexing a row twice is harmless
+        since = self._synced[lang_code][2] - SYNC_OVERLAP
+        rows = Translation.objects.using(get_read_alias()).filter(
+            language__code=lang_code, updated_at__gte=since
+        ).values_list('pk', 'message_id', 'context', 'translation', 'tenant', 'fuzzy')
+
+        for pk, message_id, context, translated, tenant, fuzzy in rows.iterator(chunk_size=2000):
+            if tenant or fuzzy:
+                memory.remove(pk)
+            else:
+                memory.add(pk, message_id, context, translated)
+        with self._lock:
+            self._synced[lang_code] = (changed, reset, started)
+
+    def update(self, instance):
+        """Index a saved translation row in the memory of its language, if loaded"""
+        memory = self._memories.get(instance.language.code)
+        if memory is not None:
+            if instance.tenant or instance.fuzzy:
+                memory.remove(instance.pk)
+            else:
+                memory.add(instance.pk, instance.message_id, instance.context, instance.translation)
+        self.touch(instance.language.code)
+
+    def remove(self, instance):
+        """Drop a deleted translation row from the memory of its language, if loaded"""
+        memory = self._memories.get(instance.language.code)
+        if memory is not None:
+            memory.remove(instance.pk)
+        # Other processes can't tell which rows are gone
+        self.reset(instance.language.code)
+
+    def suggest(self, lang_code, text, limit=5, min_score=0.5, exclude_pk=None):
+        """Suggest translations for a source string from a language's memory"""
+        return self.get(lang_code).suggest(text, limit=limit, min_score=min_score, exclude_pk=exclude_pk)
+
+    def clear(self, lang_code=None):
+        """Forget loaded memories in this process, so they're rebuilt on next use"""
+        with self._lock:
+            if lang_code:
+                self._memories.pop(lang_code, None)
+                self._synced.pop(lang_code, None)
+            else:
+                self._memories.clear()
+                self._synced.clear()
+
+
+# Create a singleton instance
+translation_memory = TranslationMemoryRegistry()
@@ -2,14 +2,18 @@ import os
 import re
 import polib
 import tempfile
+from concurrent.futures import FIRST_COMPLETED, as_completed, wait
 from django.conf import settings
-from django.utils import translation
+from django.db.models import Case, Value, When
+from django.utils import timezone, translation
 from .models import Translation, Language
 
 
-def extract_messages_from_po_file(po_file_path, language_code):
+def extract_messages_from_po_file(po_file_path, language_code, namespace='', run_id=None):
     """
-    Extract messages from a .po file and store them in the database
+    Extract messages from a .po file and store them in the database, under
+    the given namespace. With a run_id, every message found is stamped as
+    seen by that extraction run.
     """
     try:
         language = Language.objects.get(code=language_code)
@@ -22,6 +26,7 @@ def extract_messages_from_po_file(po_file_path, language_code):
         )
     
     po = polib.pofile(po_file_path)
+    defaults = {'last_seen_run': run_id} if run_id else {}
     created = 0
     updated = 0
     
@@ -39,9 +44,13 @@ def extract_messages_from_po_file(po_file_path, language_code):
             language=language,
             message_id=entry.msgid,
             context=entry.msgctxt or '',
+            tenant='',
+            namespace=namespace,
             defaults={
                 'translation': entry.msgstr,
                 'location': location[:255],  # Limit to field length
+                'fuzzy': 'fuzzy' in entry.flags,
+                **defaults,
             }
         )
         
@@ -94,3 +103,75 @@ def sync_translation_with_db(language_code, extracted_strings):
     finally:
         # Clean up the temporary file
         os.unlink(po_path)
+
+
+def iter_untranslated_chunks(language, chunk_size=500):
+    """
+    Yield lists of (pk, message_id, context) tuples for the untranslated base
+    rows of a language, in primary key order. Rows are read one chunk at a
+    time, so writes between chunks don't disturb the iteration.
+    """
+    queryset = Translation.objects.filter(language=language, tenant='', translation='').order_by('pk')
+    last_pk = None
+
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list('pk', 'message_id', 'context')[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_pk = rows[-1][0]
+
+
+def imap_bounded(executor, fn, items, max_pending):
+    """
+    Call fn(item) in an executor for each item and yield the results as they
+    complete. At most max_pending calls are in flight, so items are only
+    read as fast as the workers get through them.
+    """
+    pending = set()
+    for item in items:
+        pending.add(executor.submit(fn, item))
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    for future in as_completed(pending):
+        yield future.result()
+
+
+def save_translations(results, fuzzy=False, batch_size=500):
+    """
+    Write translated strings back to rows that are still untranslated.
+    `results` is an iterable of (pk, translation) or (pk, translation, fuzzy)
+    tuples. A row a translator has filled in since it was read is left
+    alone, so long-running jobs never overwrite reviewed work. Returns the
+    number of rows written.
+
+    The update doesn't send signals, so callers are responsible for a single
+    invalidation per language afterwards.
+    """
+    translation_field = Translation._meta.get_field('translation')
+    fuzzy_field = Translation._meta.get_field('fuzzy')
+    now = timezone.now()
+    results = list(results)
+    written = 0
+
+    for start in range(0, len(results), batch_size):
+        batch = results[start:start + batch_size]
+        translations = []
+        fuzzy_flags = []
+        for result in batch:
+            pk, translated = result[:2]
+            translations.append(When(pk=pk, then=Value(translated)))
+            fuzzy_flags.append(When(pk=pk, then=Value(result[2] if len(result) > 2 else fuzzy)))
+        # The translation='' condition is checked by the UPDATE itself, so a
+        # concurrent save can't slip in between a check and the write
+        written += Translation.objects.filter(
+            pk__in=[result[0] for result in batch], translation='',
+        ).update(
+            translation=Case(*translations, output_field=translation_field),
+            fuzzy=Case(*fuzzy_flags, output_field=fuzzy_field),
+            updated_at=now,
+        )
+    return written
@@ -40,6 +40,7 @@ setup(
     ],
     install_requires=[
         'Django>=3.2',
+        'asgiref>=3.6',
         'polib>=1.1.0',
     ],
     python_requires='>=3.8',